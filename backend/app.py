@@ -1,6 +1,6 @@
 import datetime
 import uuid
-from flask import Flask, request, Response, redirect, render_template, send_from_directory, jsonify, url_for
+from flask import Flask, request, Response, redirect, render_template, send_from_directory, jsonify, url_for, g
 import secrets
 import stripe
 from flask_mail import Mail, Message
@@ -8,10 +8,13 @@ from flask_bcrypt import Bcrypt
 from flask_jwt_extended import create_access_token, JWTManager
 from flask_cors import CORS
 import pymongo
+from pymongo import ReturnDocument, monitoring
 from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
 import os
 import json
+import logging
+import time
 from threading import Thread
 import requests
 from twilio.rest import Client
@@ -19,11 +22,21 @@ from flask import Flask, request, jsonify
 import firebase_admin
 from firebase_admin import credentials, auth
 from utils.imageUploader import upload_file
+from utils.userDirectory import UserDirectory
+from utils.mongoIndexes import ensure_indexes
+from utils.doctorDirectory import DoctorDirectory
+from utils.presence import PresenceBroadcaster, follow_change_stream
+from utils.appointmentStore import AppointmentStore, COMPLETED, UPCOMING, migrate_once
+from utils.logs import setup_logging, log_request
+from utils.metrics import (CONTENT_TYPE, DEPENDENCY_ERRORS, DEPENDENCY_LATENCY, render_metrics,
+                           request_finished, request_started, timed)
 from bson import ObjectId
 from flask_swagger_ui import get_swaggerui_blueprint
 from flasgger import Swagger
 
 load_dotenv()
+setup_logging()
+logger = logging.getLogger('backend')
 secret_key = secrets.token_hex(16)
 
 app = Flask(__name__)
@@ -74,17 +87,89 @@ if firebase_config:
     try:
         cred = credentials.Certificate(firebase_config)
         firebase_admin.initialize_app(cred)
-        print("Firebase initialized successfully!")
+        logger.info("Firebase initialized successfully")
     except json.JSONDecodeError as e:
-        print(f"JSON Decode Error: {e}")
+        logger.error("Firebase credentials are not valid JSON", extra={'error': str(e)})
 else:
-    print("Error: Firebase credentials not found in environment variables.")
+    logger.error("Firebase credentials not found in environment variables")
 
-client = pymongo.MongoClient(URI, server_api=ServerApi('1'))
+class MongoCommandTimer(monitoring.CommandListener):
+    """
+    Records the latency of every MongoDB command; pymongo calls it on the
+    thread that issued the command.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        DEPENDENCY_LATENCY.observe(event.duration_micros / 1e6, 'mongo', event.command_name)
+
+    def failed(self, event):
+        DEPENDENCY_LATENCY.observe(event.duration_micros / 1e6, 'mongo', event.command_name)
+        DEPENDENCY_ERRORS.inc('mongo', event.command_name)
+
+client = pymongo.MongoClient(URI, server_api=ServerApi('1'), event_listeners=[MongoCommandTimer()])
 
 doctors = client.get_database("telmedsphere").doctors
 patients = client.get_database("telmedsphere").patients
 website_feedback = client.get_database("telmedsphere").website_feedback
+users = client.get_database("telmedsphere").users
+password_resets = client.get_database("telmedsphere").password_resets
+
+# One document per meeting link, replacing the upcomingAppointments / completedMeets arrays
+appointments = AppointmentStore(client.get_database("telmedsphere").appointments)
+
+# Email -> role of every account, so a route queries only the collection holding it
+user_directory = UserDirectory(users, {'patient': patients, 'doctor': doctors})
+
+# Verified doctors listed by /get_status; pages are cached for DOCTOR_DIRECTORY_TTL seconds
+# and dropped whenever a route changes a doctor
+doctor_directory = DoctorDirectory(doctors, ttl_seconds=float(os.getenv('DOCTOR_DIRECTORY_TTL', 5)))
+
+# Doctor status and in-meet changes pushed to patients over /presence/stream
+presence = PresenceBroadcaster(max_subscribers=int(os.getenv('PRESENCE_MAX_SUBSCRIBERS', 200)))
+
+# Set to 1 to feed presence from a MongoDB change stream (replica set only), so every worker sees every change
+PRESENCE_CHANGE_STREAM = os.getenv('PRESENCE_CHANGE_STREAM', '0') == '1'
+if PRESENCE_CHANGE_STREAM:
+    Thread(target=follow_change_stream, args=(doctors, presence), daemon=True).start()
+
+def update_doctor_presence(email, update):
+    """
+    Applies an update touching a doctor's status or in-meet flag and announces the result.
+
+    :param email: Doctor email
+    :param update: pymongo update document
+    :return: The doctor's status and meet fields after the update, or None if there is no such doctor
+    """
+    doc = doctors.find_one_and_update({'email': email}, update, projection={'status': 1, 'meet': 1, '_id': 0},
+                                      return_document=ReturnDocument.AFTER)
+    doctor_directory.invalidate()
+    if doc is not None and not PRESENCE_CHANGE_STREAM:
+        presence.publish(email, doc.get('status', 'offline'), doc.get('meet', False))
+    return doc
+
+# Set to 0 to skip index creation at startup, e.g. when `python -m utils.mongoIndexes migrate` runs on deploy
+MONGO_ENSURE_INDEXES = os.getenv('MONGO_ENSURE_INDEXES', '1') == '1'
+
+def prepare_database():
+    # Runs off the request path; index builds do not block reads or writes on the server
+    if MONGO_ENSURE_INDEXES:
+        try:
+            ensure_indexes(client.get_database("telmedsphere"))
+        except Exception:
+            logger.exception("Index provisioning failed")
+    try:
+        user_directory.backfill()
+    except Exception:
+        logger.exception("User directory backfill failed")
+    try:
+        migrate_once(client.get_database("telmedsphere"))
+    except Exception:
+        logger.exception("Appointment migration failed")
+
+Thread(target=prepare_database, daemon=True).start()
 
 YOUR_DOMAIN = os.getenv('DOMAIN') 
 
@@ -103,9 +188,31 @@ app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
 # Test MongoDB connection
 try:
     client.admin.command('ping')
-    print("MongoDB connection successful!")
+    logger.info("MongoDB connection successful")
 except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
+    logger.error("Error connecting to MongoDB", extra={'error': str(e)})
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+    request_started()
+
+
+@app.after_request
+def log_response(response):
+    # One sampled summary line per request; see utils.logs for LOG_SAMPLE_RATES
+    if 'started' in g:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_finished(route, request.method, response.status_code, g.started)
+        if request.url_rule is not None:
+            log_request(logger, route, response.status_code, g.started, method=request.method)
+    return response
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
 
 @app.get("/")
 def getInfo():
@@ -134,12 +241,13 @@ def whatsapp_message(msg):
         }
 
         # Send the WhatsApp message
-        message = whatsappclient.messages.create(**message_params)
+        with timed('twilio', 'messages.create'):
+            message = whatsappclient.messages.create(**message_params)
 
         return {"status": "success", "message_sid": message.sid}
     
     except Exception as e:
-        print(f"Error sending message: {str(e)}")
+        logger.exception("Error sending WhatsApp message")
         return {"status": "error", "message": str(e)}
 
 # ----------- stripe payment routes -----------------
@@ -147,17 +255,18 @@ def whatsapp_message(msg):
 @app.route('/checkout')
 def create_checkout_session():
     try:
-        checkout_session = stripe.checkout.Session.create(
-            line_items = [
-                {   
-                    "price": "price_1MxPc3SAmG5gMbbMjAeavhpb",
-                    "quantity": 1
-                }
-            ],
-            mode="payment",
-            success_url=YOUR_DOMAIN + "success",
-            cancel_url = YOUR_DOMAIN + "failed"
-        )
+        with timed('stripe', 'checkout.Session.create'):
+            checkout_session = stripe.checkout.Session.create(
+                line_items = [
+                    {   
+                        "price": "price_1MxPc3SAmG5gMbbMjAeavhpb",
+                        "quantity": 1
+                    }
+                ],
+                mode="payment",
+                success_url=YOUR_DOMAIN + "success",
+                cancel_url = YOUR_DOMAIN + "failed"
+            )
     except Exception as e:
         return str(e)
  
@@ -177,13 +286,14 @@ def create_payment_intent():
             return jsonify({'error': 'Invalid amount'}), 400
 
         # Create a PaymentIntent with the order amount and currency
-        intent = stripe.PaymentIntent.create(
-            amount=int(amount * 100),  # Convert to cents
-            currency='inr',
-            automatic_payment_methods={
-                'enabled': True,
-            },
-        )
+        with timed('stripe', 'PaymentIntent.create'):
+            intent = stripe.PaymentIntent.create(
+                amount=int(amount * 100),  # Convert to cents
+                currency='inr',
+                automatic_payment_methods={
+                    'enabled': True,
+                },
+            )
 
         return jsonify({
             'clientSecret': intent.client_secret
@@ -192,9 +302,9 @@ def create_payment_intent():
     except stripe.error.StripeError as e:
         # Handle Stripe-specific errors
         return jsonify({'error': str(e)}), 400
-    except Exception as e:
+    except Exception:
         # Handle other errors
-        print(f"Payment intent creation error: {str(e)}")
+        logger.exception("Payment intent creation error")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
 # ----------- Authentication routes ----------------
@@ -210,7 +320,8 @@ def register():
     # Firebase Google Register
     if 'id_token' in data:
         try:
-            decoded_token = auth.verify_id_token(data['id_token'])
+            with timed('firebase', 'verify_id_token'):
+                decoded_token = auth.verify_id_token(data['id_token'])
             email = decoded_token.get('email')
         except:
             return jsonify({'message': 'Invalid Firebase token'}), 401
@@ -225,10 +336,12 @@ def register():
         cloudinary_url = upload_file(image_file) 
 
     # Custom Register
+    if data['registerer'] not in user_directory.collections:
+        return jsonify({'message': 'Invalid registerer type'}), 400
+    if user_directory.role(email) or not user_directory.claim(email, data['registerer']):
+        return jsonify({'message': 'User already exists'}), 400
+
     if data['registerer'] == 'patient':
-        if doctors.find_one({'email': email}) or patients.find_one({'email': email}):
-            return jsonify({'message': 'User already exists'}), 400
-        
         if 'id_token' not in data:
             hashed_password = bcrypt.generate_password_hash(data['passwd']).decode('utf-8')
             data['passwd'] = hashed_password
@@ -242,7 +355,6 @@ def register():
         data.setdefault('wallet', 0)
         data.setdefault('meet', False)
         data.setdefault('wallet_history', [])
-        data.setdefault('upcomingAppointments', [])
         if cloudinary_url:
             data['profile_picture'] = cloudinary_url
         if 'specialization' in data:
@@ -250,7 +362,11 @@ def register():
         if 'doctorId' in data:
             del data['doctorId']
         
-        patients.insert_one(data)
+        try:
+            patients.insert_one(data)
+        except Exception:
+            user_directory.release(email)
+            raise
 
         if 'phone' in data:
             whatsapp_message({
@@ -269,10 +385,7 @@ def register():
             "profile_picture": data.get("profile_picture")
         }), 200
     
-    elif data['registerer'] == 'doctor':
-        if patients.find_one({'email': email}) or doctors.find_one({'email': email}):
-            return jsonify({'message': 'User already exists'}), 400
-
+    else:
         if 'id_token' not in data:
             hashed_password = bcrypt.generate_password_hash(data['passwd']).decode('utf-8')
             data['passwd'] = hashed_password
@@ -285,7 +398,6 @@ def register():
         data.setdefault('appointments', 0)
         data.setdefault('stars', 0)
         data.setdefault('status', 'offline')
-        data.setdefault('upcomingAppointments', [])
         data.setdefault('fee', 0)
         data.setdefault('verified', False)
         data.setdefault('cart', [])
@@ -296,7 +408,12 @@ def register():
         if cloudinary_url:
             data['profile_picture'] = cloudinary_url
 
-        doctors.insert_one(data)
+        try:
+            doctors.insert_one(data)
+        except Exception:
+            user_directory.release(email)
+            raise
+        doctor_directory.invalidate()
 
         return jsonify({
             'message': 'User created successfully',
@@ -310,9 +427,6 @@ def register():
             "verified": data["verified"],
             "profile_picture": data.get("profile_picture")
         }), 200
-    
-    else:
-        return jsonify({'message': 'Invalid registerer type'}), 400
 
 @app.route('/login', methods=['POST'])
 def login():
@@ -323,7 +437,8 @@ def login():
     # Firebase Google Login
     if 'id_token' in data:
         try:
-            decoded_token = auth.verify_id_token(data['id_token'])
+            with timed('firebase', 'verify_id_token'):
+                decoded_token = auth.verify_id_token(data['id_token'])
             email = decoded_token.get('email')
         except:
             return jsonify({'message': 'Invalid Firebase token'}), 401
@@ -334,8 +449,8 @@ def login():
         return jsonify({'message': 'Email is required'}), 400
     
     # Custom Login
-    var = patients.find_one({'email': email})
-    if var:
+    role, _, var = user_directory.find(email)
+    if role == 'patient':
         if 'id_token' in data or ('passwd' in data and bcrypt.check_password_hash(var['passwd'], data['passwd'])):
             access_token = create_access_token(identity=email)
             return jsonify({
@@ -351,11 +466,10 @@ def login():
             }), 200
         return jsonify({'message': 'Invalid password'}), 400
 
-    var = doctors.find_one({'email': email})
-    if var:
+    if role == 'doctor':
         if 'id_token' in data or ('passwd' in data and bcrypt.check_password_hash(var['passwd'], data['passwd'])):
             # Update doctor status only if login is successful
-            doctors.update_one({'email': email}, {'$set': {'status': 'online'}})
+            update_doctor_presence(email, {'$set': {'status': 'online'}})
             access_token = create_access_token(identity=email)
             return jsonify({
                 'message': 'User logged in successfully',
@@ -390,6 +504,7 @@ def verify():
         else:
             # If 'verified' exists, just ensure it's set to True
             doctors.update_one({'email': email}, {'$set': {'verified': True}})
+        doctor_directory.invalidate()
         
         verified = True  # Since we just set it to True
     else:
@@ -402,17 +517,16 @@ def forgot_password():
     data = request.get_json()
     email = data['email']
     
-    user = patients.find_one({'email': email}) or doctors.find_one({'email': email})
-    if not user:
+    collection = user_directory.collection(email)
+    if collection is None:
         return jsonify({'message': 'User not found'}), 404
 
     # Generate a password reset token
     token = secrets.token_urlsafe(16)
 
-    # Store the token in the user's document with an expiration time
+    # Store the token with an expiration time; a TTL index removes it once expired
     expiration_time = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
-    patients.update_one({'email': email}, {'$set': {'reset_token': token, 'reset_token_expiration': expiration_time}})
-    doctors.update_one({'email': email}, {'$set': {'reset_token': token, 'reset_token_expiration': expiration_time}})
+    password_resets.insert_one({'_id': token, 'email': email, 'expires_at': expiration_time})
 
     # Send the token to the user's email
     reset_url = url_for('reset_password', token=token, _external=True)
@@ -420,7 +534,8 @@ def forgot_password():
                     sender=os.getenv('HOST_EMAIL'),
                     recipients=[email])
     msg.body = f"To reset your password, visit the following link: https://pratik0112-telmedsphere.vercel.app/reset-password/{token}"
-    mail.send(msg)
+    with timed('smtp', 'send'):
+        mail.send(msg)
 
     return jsonify({'message': 'Password reset link sent'}), 200
 
@@ -430,16 +545,15 @@ def reset_password(token):
     new_password = data['password']
     hashed_password = bcrypt.generate_password_hash(new_password).decode('utf-8')
 
-    # Find the user with the token and check if it's still valid
-    user = patients.find_one({'reset_token': token, 'reset_token_expiration': {'$gt': datetime.datetime.utcnow()}}) or \
-           doctors.find_one({'reset_token': token, 'reset_token_expiration': {'$gt': datetime.datetime.utcnow()}})
+    # Take the token if it's still valid, so it cannot be used twice
+    reset = password_resets.find_one_and_delete({'_id': token, 'expires_at': {'$gt': datetime.datetime.utcnow()}})
+    collection = user_directory.collection(reset['email']) if reset else None
     
-    if not user:
+    if collection is None:
         return jsonify({'message': 'The reset link is invalid or has expired'}), 400
 
-    # Update the user's password and remove the reset token
-    patients.update_one({'reset_token': token}, {'$set': {'passwd': hashed_password}, '$unset': {'reset_token': "", 'reset_token_expiration': ""}})
-    doctors.update_one({'reset_token': token}, {'$set': {'passwd': hashed_password}, '$unset': {'reset_token': "", 'reset_token_expiration': ""}})
+    # Update the user's password; older tokens were kept on the user document itself
+    collection.update_one({'email': reset['email']}, {'$set': {'passwd': hashed_password}, '$unset': {'reset_token': "", 'reset_token_expiration': ""}})
 
     return jsonify({'message': 'Password has been reset'}), 200
 
@@ -448,7 +562,7 @@ def reset_password(token):
 def doc_status():
     data = request.get_json()
     user = data['email']
-    doctors.update_one({'email': user}, {'$set': {'status': 'offline'}})
+    update_doctor_presence(user, {'$set': {'status': 'offline'}})
     return jsonify({'message': 'Doctor status updated successfully'}), 200
 
 # @app.route('/meet_end', methods=['PUT'])
@@ -458,19 +572,34 @@ def doc_status():
 #     doctor.update_one({'email': user}, {'$set': {'meet': False}})
 #     return jsonify({'message': 'Doctor status updated successfully'}), 200
 
+@app.route('/presence/stream', methods=['GET'])
+def presence_stream():
+    # Browsers reconnect on their own and send the id of the last event they saw
+    if not presence.acquire():
+        return jsonify({'message': 'Too many presence subscribers, poll /get_status instead'}), 503, {'Retry-After': '30'}
+    response = Response(presence.stream(request.headers.get('Last-Event-ID')), mimetype='text/event-stream')
+    response.call_on_close(presence.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keeps reverse proxies such as nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/get_status', methods=['GET'])
 def get_status():
-    details = []
-    count = 0
-    for i in doctors.find():
-        if i.get('verified', False):
-            count += 1
-            details.append({"email": i["email"], "status": i.get("status", "offline"), "username": i["username"], "specialization": i["specialization"], "gender": i["gender"], "phone": i["phone"], "isInMeet": i["meet"], "noOfAppointments": i["appointments"], "noOfStars": i["stars"], "id": count, 'fee': i.get('fee', 199)})
-    return jsonify({"details": details}), 200
+    # Without ?limit= every verified doctor is listed, as the landing page expects
+    limit = request.args.get('limit', type=int)
+    if limit is not None and not 1 <= limit <= 100:
+        return jsonify({'message': 'limit must be between 1 and 100'}), 400
+    try:
+        page = doctor_directory.page(request.args.get('specialization'), request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(page), 200
 
 def send_message_async(msg):
     with app.app_context():
-        mail.send(msg)
+        with timed('smtp', 'send'):
+            mail.send(msg)
         # os.remove(os.path.join(app.root_path, 'upload', 'Receipt.pdf'))
 
 @app.get('/media/<path:path>')
@@ -498,45 +627,14 @@ def mail_file():
         return jsonify({"error": "File upload failed", "details": file_url}), 500
     
     # Retrieve patient and doctor details from the database
-    pat = patients.find_one({'email': pemail})
-    doc = doctors.find_one({'email': demail})
+    pat = patients.find_one({'email': pemail}, {'username': 1, 'phone': 1})
+    doc = doctors.find_one({'email': demail}, {'_id': 1})
 
     if not pat or not doc:
         return jsonify({"error": "Doctor or Patient not found"}), 404
 
-    appointment_found = False 
-
-    # Find the upcoming appointment based on meetLink
-    for appointment in pat.get('upcomingAppointments', []):
-        if appointment.get('link') == meetLink:
-            appointment['prescription'] = file_url  # Add prescription link
-            appointment_found = True
-            break
-
-    for appointment in doc.get('upcomingAppointments', []):
-        if appointment.get('link') == meetLink:
-            appointment['prescription'] = file_url  # Add prescription link
-            appointment_found = True
-            break
-
-    # If not found in upcomingAppointments, check completedMeets
-    if not appointment_found:
-        for appointment in pat.get('completedMeets', []):
-            if appointment.get('link') == meetLink:
-                appointment['prescription'] = file_url  # Add prescription link
-                appointment_found = True
-                break
-
-        for appointment in doc.get('completedMeets', []):
-            if appointment.get('link') == meetLink:
-                appointment['prescription'] = file_url  # Add prescription link
-                appointment_found = True
-                break
-
-    # If appointment was found, update the database
-    if appointment_found:
-        patients.update_one({'email': pemail}, {"$set": {"upcomingAppointments": pat.get('upcomingAppointments', []), "completedMeets": pat.get('completedMeets', [])}})
-        doctors.update_one({'email': demail}, {"$set": {"upcomingAppointments": doc.get('upcomingAppointments', []), "completedMeets": doc.get('completedMeets', [])}})
+    # Add the prescription link to the appointment, whether upcoming or completed
+    appointments.attach_prescription(meetLink, file_url)
 
     # Prepare the email message
     msg = Message(
@@ -563,7 +661,7 @@ def mail_file():
     try:
         os.remove(file_path)
     except Exception as e:
-        print(f"Error deleting file: {e}")
+        logger.warning("Error deleting receipt file", extra={'path': file_path, 'error': str(e)})
     
     return jsonify({"message": "Success"}), 200
 
@@ -573,22 +671,14 @@ def mail_file():
 def doctor_apo():
     data = request.get_json()
     email = data['demail']
-    doc = doctors.find_one({'email': email})
 
     if request.method == 'POST':
-        return jsonify({'message': 'Doctor Appointments', 'upcomingAppointments': doc['upcomingAppointments']}), 200
+        return jsonify({'message': 'Doctor Appointments', 'upcomingAppointments': appointments.listed('demail', email, UPCOMING)}), 200
     else:
-        doc['upcomingAppointments'].append({
-            "date": data['date'],
-            "time": data['time'],
-            "patient": data['patient'],
-            "demail": data['demail'],
-            "link": data['link'],
-        })
-        doctors.update_one({'email': email}, {'$set': {'upcomingAppointments': doc['upcomingAppointments']}})
+        appointments.book(data['link'], date=data['date'], time=data['time'], patient=data['patient'], demail=email)
         return jsonify({
             'message': 'Doctor status updated successfully',
-            'upcomingAppointments': doc['upcomingAppointments']
+            'upcomingAppointments': appointments.listed('demail', email, UPCOMING)
         }), 200
 
 @app.route('/update_doctor_ratings', methods=['PUT'])
@@ -605,57 +695,16 @@ def doctor_app():
     if not all([pemail, demail, meet_link, stars]):
         return jsonify({'error': 'Missing required fields'}), 400
 
-    # Find patient's upcoming appointment
-    patient_doc = patients.find_one({'email': pemail, 'upcomingAppointments.link': meet_link})
-    if not patient_doc:
-        return jsonify({'error': 'Patient not found or appointment does not exist'}), 404
-
-    # Find doctor's upcoming appointment
-    doctor_doc = doctors.find_one({'email': demail, 'upcomingAppointments.link': meet_link})
-    if not doctor_doc:
-        return jsonify({'error': 'Doctor not found or appointment does not exist'}), 404
-
-    # Retrieve the appointment object from patient's record
-    appointment = next(
-        (appt for appt in patient_doc.get('upcomingAppointments', []) if appt['link'] == meet_link),
-        None
-    )
-
-    if not appointment:
-        return jsonify({'error': 'Appointment details not found'}), 404
-
-    # Add stars to appointment
-    appointment['stars'] = stars
-
-    # Remove appointment from patient's upcomingAppointments
-    patients.update_one(
-        {'email': pemail},
-        {'$pull': {'upcomingAppointments': {'link': meet_link}}}
-    )
-
-    # Remove appointment from doctor's upcomingAppointments
-    doctors.update_one(
-        {'email': demail},
-        {'$pull': {'upcomingAppointments': {'link': meet_link}}}
-    )
-
-    # Append to patient's completedMeet
-    patients.update_one(
-        {'email': pemail},
-        {'$push': {'completedMeets': appointment}}
-    )
-
-    # Append to doctor's completedMeet
-    doctors.update_one(
-        {'email': demail},
-        {'$push': {'completedMeets': appointment}}
-    )
+    # Move the appointment from upcoming to completed, with its rating
+    if not appointments.complete(meet_link, pemail, demail, stars):
+        return jsonify({'error': 'Appointment not found or already rated'}), 404
 
     # Update doctor's ratings and appointment count
     rating_update = doctors.update_one(
         {'email': demail},
         {'$inc': {'appointments': 1, 'stars': stars}}
     )
+    doctor_directory.invalidate()
 
     if rating_update.matched_count == 0:
         return jsonify({'error': 'Doctor rating update failed'}), 404
@@ -684,19 +733,12 @@ def set_appointment():
 def patient_apo():
     data = request.get_json()
     email = data['email']
-    pat = patients.find_one({'email': email})
 
     if request.method == 'POST':
-        return jsonify({'message': 'Patient Appointments', 'appointments': pat['upcomingAppointments']}), 200
+        return jsonify({'message': 'Patient Appointments', 'appointments': appointments.listed('pemail', email, UPCOMING)}), 200
     else:
-        pat['upcomingAppointments'].append({
-            "date": data['date'],
-            "time": data['time'],
-            "doctor": data['doctor'],
-            "demail": data['demail'],
-            "link": data['link'],
-        })
-        patients.update_one({'email': email}, {'$set': {'upcomingAppointments': pat['upcomingAppointments']}})
+        appointments.book(data['link'], date=data['date'], time=data['time'], doctor=data['doctor'],
+                          demail=data['demail'], pemail=email)
         return jsonify({'message': 'Patient status updated successfully'}), 200
     
 @app.route('/completed_meets', methods=['POST'])
@@ -708,31 +750,23 @@ def completed_meets():
 
     useremail = data['useremail']
 
-    # Check if user is a doctor
-    doctor = doctors.find_one({'email': useremail}, {'completedMeets': 1, '_id': 0})
-    if doctor:
-        completed_meets = doctor.get('completedMeets', [])
-        
-        # Fetch patient usernames
-        for meet in completed_meets:
-            patient = patients.find_one({'email': meet.get('pemail')}, {'username': 1, '_id': 0})
-            meet['patient'] = patient.get('username', 'Unknown') if patient else 'Unknown'
-        
-        return jsonify({"completedMeets": completed_meets}), 200
+    role = user_directory.role(useremail)
+    if role is None:
+        return jsonify({"error": "User not found"}), 404
+    completed_meets = appointments.listed('demail' if role == 'doctor' else 'pemail', useremail, COMPLETED)
 
-    # Check if user is a patient
-    patient = patients.find_one({'email': useremail}, {'completedMeets': 1, '_id': 0})
-    if patient:
-        completed_meets = patient.get('completedMeets', [])
-        
-        # Fetch doctor usernames
-        for meet in completed_meets:
-            doctor = doctors.find_one({'email': meet.get('demail')}, {'username': 1, '_id': 0})
-            meet['doctor'] = doctor.get('username', 'Unknown') if doctor else 'Unknown'
-        
-        return jsonify({"completedMeets": completed_meets}), 200
+    # Usernames of the other participants, fetched in one query
+    if role == 'doctor':
+        others, email_key, name_key = patients, 'pemail', 'patient'
+    else:
+        others, email_key, name_key = doctors, 'demail', 'doctor'
+    emails = list({meet.get(email_key) for meet in completed_meets})
+    names = {other['email']: other.get('username', 'Unknown')
+             for other in others.find({'email': {'$in': emails}}, {'email': 1, 'username': 1, '_id': 0})}
+    for meet in completed_meets:
+        meet[name_key] = names.get(meet.get(email_key), 'Unknown')
 
-    return jsonify({"error": "User not found"}), 404
+    return jsonify({"completedMeets": completed_meets}), 200
 
 # ----------- meeting routes -----------------
 
@@ -743,8 +777,6 @@ def make_meet():
 
     # Validate required fields for PUT request
     if request.method == 'PUT':
-        doctors.update_one({'email': demail}, {'$set': {'link': {'link': data['link'], "name": data['patient']}}})
-
         required_fields = ['demail', 'pemail', 'date', 'time', 'link']
         if not all(field in data for field in required_fields):
             return jsonify({'error': 'Missing required fields'}), 400
@@ -755,29 +787,9 @@ def make_meet():
             {'$set': {'link': {'link': data['link'], 'name': data['patient']}}}
         )
 
-        # Add to doctor's upcoming appointments
-        doctors.update_one(
-            {'email': demail},
-            {'$push': {'upcomingAppointments': {
-                'demail': data['demail'],
-                'pemail': data['pemail'],
-                'date': data['date'],
-                'time': data['time'],
-                'link': data['link']
-            }}}
-        )
-
-        # Add to patient's upcoming appointments
-        patients.update_one(
-            {'email': data['pemail']},
-            {'$push': {'upcomingAppointments': {
-                'demail': data['demail'],
-                'pemail': data['pemail'],
-                'date': data['date'],
-                'time': data['time'],
-                'link': data['link']
-            }}}
-        )
+        # Add to both participants' upcoming appointments
+        appointments.book(data['link'], demail=data['demail'], pemail=data['pemail'],
+                          date=data['date'], time=data['time'])
 
         return jsonify({'message': 'Meet link created and appointments updated successfully'}), 200
 
@@ -795,17 +807,16 @@ def meet_status():
         return jsonify({'message': 'Doctor is already in a meet', 'link': details.get('link', '')}), 208
     else:
         if data.get('link', '') == '':
-            doctors.update_one({'email': user}, {'$set': {'meet': True}})
+            update_doctor_presence(user, {'$set': {'meet': True}})
         else:
-            doctors.update_one({'email': user}, {'$set': {'meet': True, 'link': data['link']}})
+            update_doctor_presence(user, {'$set': {'meet': True, 'link': data['link']}})
         return jsonify({'message': 'Doctor status updated successfully'}), 200
 
 @app.route('/delete_meet', methods=['PUT'])
 def delete_meet():
     data = request.get_json()
     email = data['email']
-    doctors.update_one({'email': email}, {'$unset': {'link': None, 'currentlyInMeet': None}})
-    doctors.update_one({'email': email}, {'$set': {'meet': False}})
+    update_doctor_presence(email, {'$unset': {'link': None, 'currentlyInMeet': None}, '$set': {'meet': False}})
 
     return jsonify({'message': 'Meet link deleted successfully'}), 200
 
@@ -830,7 +841,7 @@ def currently_in_meet():
 def doctor_avilability():
     data = request.get_json()
     demail = data['demail']
-    doctors.update_one({'email': demail}, {'$set': {'status': 'online'}})
+    update_doctor_presence(demail, {'$set': {'status': 'online'}})
     return jsonify({'message': 'Doctor status updated successfully'}), 200
 
 # ----------- orders routes -----------------
@@ -838,35 +849,24 @@ def doctor_avilability():
 def add_order():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email': email})
-    if var:
-        orders = var.get('orders', [])
-        for i in data["orders"]:
-            i['key'] = str(uuid.uuid4())
-            i['Ordered_on'] = datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            orders.append(i)
-        patients.update_one({'email': email}, {'$set': {'orders': orders}})
-        return jsonify({'message': 'Order added successfully'}), 200
-    else:
-        var = doctors.find_one({"email":email})
-        orders = var.get('orders', [])
-        for i in data["orders"]:
-            i['key'] = str(uuid.uuid4())
-            i['Ordered_on'] = datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            orders.append(i)
-        doctors.update_one({'email': email}, {'$set': {'orders': orders}})
-        return jsonify({'message': 'Order added successfully'}), 200
+    collection = user_directory.collection(email)
+    if collection is None:
+        return jsonify({'message': 'User not found'}), 404
+    orders = data["orders"]
+    for i in orders:
+        i['key'] = str(uuid.uuid4())
+        i['Ordered_on'] = datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    collection.update_one({'email': email}, {'$push': {'orders': {'$each': orders}}})
+    return jsonify({'message': 'Order added successfully'}), 200
     
 @app.route("/get_orders", methods=['POST'])
 def get_orders():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email':email})
-    if var:
-        return jsonify({'message': 'Orders', 'orders': var['orders']}), 200
-    else:
-        var = doctors.find_one({'email': email})
-        return jsonify({'message': 'Orders', 'orders': var['orders']}), 200
+    _, _, var = user_directory.find(email, {'orders': 1})
+    if var is None:
+        return jsonify({'message': 'User not found'}), 404
+    return jsonify({'message': 'Orders', 'orders': var.get('orders', [])}), 200
 
 @app.route('/update_details', methods=['PUT'])
 def update_details():
@@ -920,6 +920,8 @@ def update_details():
     # Update in MongoDB
     collection = doctors if usertype == 'doctor' else patients
     result = collection.update_one({'email': email}, {'$set': update_data})
+    if usertype == 'doctor':
+        doctor_directory.invalidate()
 
     # Check if a document was updated
     if result.matched_count == 0:
@@ -945,118 +947,77 @@ def update_details():
 def add_to_cart():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email': email})
-    if var:
-        cart = var.get('cart', [])
-        for i in data["cart"]:
-            for j in cart:
-                if j['id'] == i['id']:
-                    j['quantity'] = i['quantity']
-                    break
-            else:
-                i['key'] = str(uuid.uuid4())
-                cart.append(i)
-        patients.update_one({'email': email}, {'$set': {'cart': cart}})
-        return jsonify({'message': 'Cart added successfully', 'cart': cart}), 200
-    else:
-        var = doctors.find_one({"email":email})
-        cart = var.get('cart', [])
-        for i in data["cart"]:
-            for j in cart:
-                if j['id'] == i['id']:
-                    j['quantity'] = i['quantity']
-                    break
-            else:
-                i['key'] = str(uuid.uuid4())
-                cart.append(i)
-        doctors.update_one({'email': email}, {'$set': {'cart': cart}})
-        return jsonify({'message': 'Cart added successfully', 'cart': cart}), 200
+    _, collection, var = user_directory.find(email, {'cart': 1})
+    if var is None:
+        return jsonify({'message': 'User not found'}), 404
+    cart = var.get('cart', [])
+    for i in data["cart"]:
+        for j in cart:
+            if j['id'] == i['id']:
+                j['quantity'] = i['quantity']
+                break
+        else:
+            i['key'] = str(uuid.uuid4())
+            cart.append(i)
+    collection.update_one({'email': email}, {'$set': {'cart': cart}})
+    return jsonify({'message': 'Cart added successfully', 'cart': cart}), 200
     
 @app.route("/get_cart", methods=['POST'])
 def get_cart():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email':email})
-    if var:
-        return jsonify({'message': 'Cart', 'cart': var.get('cart', [])}), 200
-    else:
-        var = doctors.find_one({'email': email})
-        return jsonify({'message': 'Cart', 'cart': var.get('cart', [])}), 200
+    _, _, var = user_directory.find(email, {'cart': 1})
+    if var is None:
+        return jsonify({'message': 'User not found'}), 404
+    return jsonify({'message': 'Cart', 'cart': var.get('cart', [])}), 200
 
 @app.route('/increase_quantity', methods=['POST'])
 def increase_quantity():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email': email})
-    if var:
-        for i in var['cart']:
-            if i['id'] == data['id']:
-                i['quantity'] += 1
-                break
-        patients.update_one({'email': email}, {'$set': {'cart': var['cart']}})
-        return jsonify({'message': 'Quantity increased successfully'}), 200
-    else:
-        var = doctors.find_one({'email': email})
-        for i in var['cart']:
-            if i['id'] == data['id']:
-                i['quantity'] += 1
-                break
-        doctors.update_one({'email': email}, {'$set': {'cart': var['cart']}})
-        return jsonify({'message': 'Quantity increased successfully'}), 200
+    _, collection, var = user_directory.find(email, {'cart': 1})
+    if var is None:
+        return jsonify({'message': 'User not found'}), 404
+    for i in var['cart']:
+        if i['id'] == data['id']:
+            i['quantity'] += 1
+            break
+    collection.update_one({'email': email}, {'$set': {'cart': var['cart']}})
+    return jsonify({'message': 'Quantity increased successfully'}), 200
     
 @app.route('/decrease_quantity', methods=['POST'])
 def decrease_quantity():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email': email})
-    if var:
-        for i in var['cart']:
-            if i['id'] == data['id']:
-                i['quantity'] -= 1
-                break
-        patients.update_one({'email': email}, {'$set': {'cart': var['cart']}})
-        return jsonify({'message': 'Quantity increased successfully'}), 200
-    else:
-        var = doctors.find_one({'email': email})
-        for i in var['cart']:
-            if i['id'] == data['id']:
-                i['quantity'] -= 1
-                break
-        doctors.update_one({'email': email}, {'$set': {'cart': var['cart']}})
-        return jsonify({'message': 'Quantity increased successfully'}), 200
+    _, collection, var = user_directory.find(email, {'cart': 1})
+    if var is None:
+        return jsonify({'message': 'User not found'}), 404
+    for i in var['cart']:
+        if i['id'] == data['id']:
+            i['quantity'] -= 1
+            break
+    collection.update_one({'email': email}, {'$set': {'cart': var['cart']}})
+    return jsonify({'message': 'Quantity increased successfully'}), 200
     
 @app.route("/delete_cart", methods=['POST'])
 def delete_cart():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email':email})
-    if var:
-        cart = var['cart']
-        for i in var['cart']:
-            if i['id'] == data['id']:
-                cart.remove(i)
-        patients.update_one({'email': email}, {'$set': {'cart': cart}})
-        return jsonify({'message': 'Cart deleted successfully'}), 200
-    else:
-        var = doctors.find_one({'email': email})
-        cart = var['cart']
-        for i in var['cart']:
-            if i['id'] == data['id']:
-                cart.remove(i)
-        doctors.update_one({'email': email}, {'$set': {'cart': cart}})
-        return jsonify({'message': 'Cart deleted successfully'}), 200
+    collection = user_directory.collection(email)
+    if collection is None:
+        return jsonify({'message': 'User not found'}), 404
+    collection.update_one({'email': email}, {'$pull': {'cart': {'id': data['id']}}})
+    return jsonify({'message': 'Cart deleted successfully'}), 200
     
 @app.route("/delete_all_cart", methods=['POST'])
 def delete_all_cart():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({"email": email})
-    if var:
-        patients.update_one({'email': email}, {'$set': {'cart': []}})
-        return jsonify({'message': 'Cart deleted successfully'}), 200
-    else:
-        doctors.update_one({'email': email}, {'$set': {'cart': []}})
-        return jsonify({'message': 'Cart deleted successfully'}), 200
+    collection = user_directory.collection(email)
+    if collection is None:
+        return jsonify({'message': 'User not found'}), 404
+    collection.update_one({'email': email}, {'$set': {'cart': []}})
+    return jsonify({'message': 'Cart deleted successfully'}), 200
 
 
 # ----------- wallet routes -----------------
@@ -1065,77 +1026,54 @@ def delete_all_cart():
 def wallet():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email': email})
-    if var:
-        wallet = var.get('wallet', 0)+round(float(data['walletAmount']))
-        patients.update_one({'email': email}, {'$set': {'wallet': wallet}})
-        return jsonify({'message': 'Wallet updated successfully'}), 200
-    else:
-        var = doctors.find_one({'email': email})
-        wallet = var.get('wallet', 0)+round(float(data['walletAmount']))
-        doctors.update_one({'email': email}, {'$set': {'wallet': wallet}})
-        return jsonify({'message': 'Wallet updated successfully'}), 200
+    collection = user_directory.collection(email)
+    if collection is None:
+        return jsonify({'message': 'User not found'}), 404
+    collection.update_one({'email': email}, {'$inc': {'wallet': round(float(data['walletAmount']))}})
+    return jsonify({'message': 'Wallet updated successfully'}), 200
 
 @app.route('/get_wallet', methods=['POST'])
 def get_wallet():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email': email})
-    if var:
-        return jsonify({'message': 'Wallet', 'wallet': var.get('wallet', 0)}), 200
-    else:
-        var = doctors.find_one({'email': email})
-        return jsonify({'message': 'Wallet', 'wallet': var.get('wallet', 0)}), 200
+    _, _, var = user_directory.find(email, {'wallet': 1})
+    if var is None:
+        return jsonify({'message': 'User not found'}), 404
+    return jsonify({'message': 'Wallet', 'wallet': var.get('wallet', 0)}), 200
 
 @app.route("/debit_wallet", methods=['POST'])
 def debit_wallet():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email': email})
     if data.get('demail', False):
         demail = data['demail']
-        doc = doctors.find_one({'email': demail})
-        wallet = var.get('wallet', 0)-round(float(doc.get('fee', 0)))
-        patients.update_one({'email': email}, {'$set': {'wallet': wallet}})
+        doc = doctors.find_one({'email': demail}, {'fee': 1})
+        patients.update_one({'email': email}, {'$inc': {'wallet': -round(float(doc.get('fee', 0)))}})
         return jsonify({'message': 'Wallet updated successfully', "fee":float(doc.get('fee', 0)) }), 200
-    else:
-        if var:
-            wallet = var.get('wallet', 0)-round(float(data['walletAmount']))
-            patients.update_one({'email': email}, {'$set': {'wallet': wallet}})
-            return jsonify({'message': 'Wallet updated successfully'}), 200
-        else:
-            var = doctors.find_one({'email': email})
-            wallet = var.get('wallet', 0)-round(float(data['walletAmount']))
-            doctors.update_one({'email': email}, {'$set': {'wallet': wallet}})
-            return jsonify({'message': 'Wallet updated successfully'}), 200
+    collection = user_directory.collection(email)
+    if collection is None:
+        return jsonify({'message': 'User not found'}), 404
+    collection.update_one({'email': email}, {'$inc': {'wallet': -round(float(data['walletAmount']))}})
+    return jsonify({'message': 'Wallet updated successfully'}), 200
     
 @app.route('/add_wallet_history', methods=['POST'])
 def add_wallet_history():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email': email})
-    if var:
-        history = var.get('wallet_history', [])
-        history.append(data['history'])
-        patients.update_one({'email': email}, {'$set': {'wallet_history': history}})
-        return jsonify({'message': 'Wallet history added successfully'}), 200
-    else:
-        var = doctors.find_one({'email': email})
-        history = var.get('wallet_history', [])
-        history.append(data['history'])
-        doctors.update_one({'email': email}, {'$set': {'wallet_history': history}})
-        return jsonify({'message': 'Wallet history added successfully'}), 200
+    collection = user_directory.collection(email)
+    if collection is None:
+        return jsonify({'message': 'User not found'}), 404
+    collection.update_one({'email': email}, {'$push': {'wallet_history': data['history']}})
+    return jsonify({'message': 'Wallet history added successfully'}), 200
     
 @app.route('/get_wallet_history', methods=['POST'])
 def get_wallet_history():
     data = request.get_json()
     email = data['email']
-    var = patients.find_one({'email': email})
-    if var:
-        return jsonify({'message': 'Wallet history', 'wallet_history': var.get('wallet_history', [])}), 200
-    else:
-        var = doctors.find_one({'email': email})
-        return jsonify({'message': 'Wallet history', 'wallet_history': var.get('wallet_history', [])}), 200
+    _, _, var = user_directory.find(email, {'wallet_history': 1})
+    if var is None:
+        return jsonify({'message': 'User not found'}), 404
+    return jsonify({'message': 'Wallet history', 'wallet_history': var.get('wallet_history', [])}), 200
 
 #------------ feedback route ------------------------------
 @app.route('/website_feedback', methods=['POST'])
@@ -1153,9 +1091,7 @@ def save_website_feedback():
     keep_it_anonymous = data.get("keep_it_anonymous", False)
 
     # Fetch patient details using pemail
-    user = patients.find_one({"email": user_email}, {"_id": 0, "username": 1, "profile_picture": 1})
-    if not user :
-       user = doctors.find_one({"email": user_email}, {"_id": 0, "username": 1, "profile_picture": 1})
+    _, _, user = user_directory.find(user_email, {"_id": 0, "username": 1, "profile_picture": 1})
     
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -1227,7 +1163,8 @@ def contact():
             Message: {data['message']}
             """
         )
-        mail.send(msg)
+        with timed('smtp', 'send'):
+            mail.send(msg)
         return jsonify({"message": "Message sent successfully"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
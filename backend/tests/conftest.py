@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# The backend imports its helpers as `utils.*`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Third-party services app.py sets up at import time
+APP_DEPENDENCIES = ('stripe', 'twilio.rest', 'firebase_admin', 'flask_mail', 'flask_bcrypt', 'flask_jwt_extended',
+                    'dotenv', 'flask_swagger_ui', 'flasgger', 'requests', 'cloudinary')
+
+
+@pytest.fixture(scope='session')
+def backend():
+    """
+    app.py imported against an in-memory MongoDB, without Firebase or Twilio credentials.
+    """
+    for module in APP_DEPENDENCIES:
+        pytest.importorskip(module)
+    mongomock = pytest.importorskip('mongomock')
+    import firebase_admin
+    import pymongo
+    from firebase_admin import credentials
+
+    with pytest.MonkeyPatch.context() as patch:
+        for name in ('TWILIO_WHATSAPP_ACCOUNT_SID', 'TWILIO_WHATSAPP_AUTH_TOKEN', 'FIREBASE_PRIVATE_KEY'):
+            patch.setenv(name, 'test')
+        patch.setenv('MONGO_ENSURE_INDEXES', '0')
+        patch.setattr(pymongo, 'MongoClient', lambda *args, **kwargs: mongomock.MongoClient())
+        patch.setattr(credentials, 'Certificate', lambda config: config)
+        patch.setattr(firebase_admin, 'initialize_app', lambda credential: None)
+        import app
+    # The startup migrations must not write into a test's database
+    for thread in threading.enumerate():
+        if getattr(thread, '_target', None) is app.prepare_database:
+            thread.join()
+    return app
+
+
+@pytest.fixture
+def db(backend):
+    db = backend.client.get_database('telmedsphere')
+    for name in db.list_collection_names():
+        db.drop_collection(name)
+    backend.user_directory.complete = False
+    backend.user_directory._roles.clear()
+    backend.doctor_directory.invalidate()
+    return db
+
+
+@pytest.fixture
+def client(backend, db):
+    return backend.app.test_client()
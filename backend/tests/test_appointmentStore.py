@@ -0,0 +1,62 @@
+import pytest
+
+from utils.appointmentStore import COMPLETED, UPCOMING, AppointmentStore, booking_order, migrate_embedded
+
+mongomock = pytest.importorskip('mongomock')
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient().get_database('telmedsphere')
+    db.doctors.insert_many([
+        {'email': 'doc@example.com', 'completedMeets': [{'link': 'meet/old', 'date': '2023-12-24', 'time': '10:00'}],
+         'upcomingAppointments': [
+             # Booked first, for a date far ahead
+             {'link': 'meet/far', 'date': '2099-01-01', 'time': '09:00', 'patient': 'Fay'},
+             {'link': 'meet/a', 'date': '2024-03-01', 'time': '16:00', 'patient': 'Ann'},
+             {'link': 'meet/b', 'date': '2024-02-01', 'time': '16:00', 'patient': 'Pat'},
+         ]},
+        {'email': 'other@example.com', 'upcomingAppointments': [
+            {'link': 'meet/c', 'date': '2024-05-01', 'time': '11:00', 'patient': 'Pat'},
+        ]},
+    ])
+    # The patient booked meet/c with the other doctor between meet/a and meet/b
+    db.patients.insert_one({'email': 'pat@example.com', 'upcomingAppointments': [
+        {'link': 'meet/c', 'date': '2024-05-01', 'time': '11:00', 'doctor': 'Dr O'},
+        {'link': 'meet/b', 'date': '2024-02-01', 'time': '16:00', 'doctor': 'Dr D'},
+        {'date': '2024-06-01', 'doctor': 'Dr D'},
+    ]})
+    return db
+
+
+def listed_links(db, role_field='demail', email='doc@example.com', status=UPCOMING):
+    return [a['link'] for a in AppointmentStore(db.appointments).listed(role_field, email, status)]
+
+
+def test_migration_keeps_every_users_order(db):
+    assert migrate_embedded(db) == (7, 1)
+
+    assert listed_links(db) == ['meet/far', 'meet/a', 'meet/b']
+    assert listed_links(db, 'pemail', 'pat@example.com') == ['meet/c', 'meet/b']
+    assert listed_links(db, status=COMPLETED) == ['meet/old']
+    # Both participants' entries end up on one appointment
+    assert db.appointments.find_one({'_id': 'meet/b'})['pemail'] == 'pat@example.com'
+
+
+def test_appointments_booked_after_migration_are_listed_last(db):
+    migrate_embedded(db)
+    AppointmentStore(db.appointments).book('meet/new', demail='doc@example.com', date='2024-01-01', time='08:00')
+
+    assert listed_links(db)[-1] == 'meet/new'
+
+
+def test_rerunning_the_migration_keeps_created_at(db):
+    migrate_embedded(db)
+    first = db.appointments.find_one({'_id': 'meet/a'})['created_at']
+    migrate_embedded(db)
+
+    assert db.appointments.find_one({'_id': 'meet/a'})['created_at'] == first
+
+
+def test_booking_order_ranks_contradicting_arrays_last_by_first_sight():
+    assert booking_order([['a', 'b'], ['b', 'a'], ['c']]) == {'c': 0, 'a': 1, 'b': 2}
@@ -0,0 +1,94 @@
+import pytest
+from bson import ObjectId
+
+from utils.doctorDirectory import DoctorDirectory, decode_cursor
+
+mongomock = pytest.importorskip('mongomock')
+
+
+def add_doctors(collection, count, **fields):
+    ids = [ObjectId() for _ in range(count)]
+    collection.insert_many([{'_id': _id, 'email': f'doc{i}@example.com', 'verified': True, 'wallet': 100,
+                             'specialization': 'Cardiology' if i % 2 else 'Dermatology', **fields}
+                            for i, _id in enumerate(ids)])
+    return ids
+
+
+@pytest.fixture
+def doctors():
+    collection = mongomock.MongoClient().get_database('telmedsphere').doctors
+    add_doctors(collection, 5)
+    collection.insert_one({'email': 'unverified@example.com', 'verified': False})
+    return collection
+
+
+def test_cursor_pages_through_every_verified_doctor(doctors):
+    directory = DoctorDirectory(doctors)
+    pages, cursor = [], None
+    while True:
+        page = directory.page(cursor=cursor, limit=2)
+        pages.append(page['details'])
+        cursor = page['next']
+        if cursor is None:
+            break
+
+    assert [len(details) for details in pages] == [2, 2, 1]
+    listed = [doctor for details in pages for doctor in details]
+    assert [doctor['email'] for doctor in listed] == [f'doc{i}@example.com' for i in range(5)]
+    assert [doctor['id'] for doctor in listed] == [1, 2, 3, 4, 5]
+
+
+def test_page_is_filtered_and_projected(doctors):
+    details = DoctorDirectory(doctors).page(specialization='Cardiology')['details']
+
+    assert [doctor['email'] for doctor in details] == ['doc1@example.com', 'doc3@example.com']
+    assert details[0] == {'email': 'doc1@example.com', 'status': 'offline', 'username': None,
+                          'specialization': 'Cardiology', 'gender': None, 'phone': None, 'isInMeet': False,
+                          'noOfAppointments': 0, 'noOfStars': 0, 'id': 1, 'fee': 199}
+
+
+def test_pages_are_cached_until_a_doctor_changes(doctors):
+    directory = DoctorDirectory(doctors, ttl_seconds=60)
+    directory.page()
+    doctors.update_one({'email': 'doc0@example.com'}, {'$set': {'status': 'online'}})
+
+    assert directory.page()['details'][0]['status'] == 'offline'
+    directory.invalidate()
+    assert directory.page()['details'][0]['status'] == 'online'
+
+
+@pytest.mark.parametrize('cursor', ['nope', 'nope.2', f'{ObjectId()}.x'])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_get_status_lists_every_verified_doctor_without_a_limit(client, db):
+    add_doctors(db.doctors, 3)
+    response = client.get('/get_status')
+
+    assert response.status_code == 200
+    assert response.get_json()['next'] is None
+    assert len(response.get_json()['details']) == 3
+
+
+def test_get_status_pages_with_cursors(client, db):
+    add_doctors(db.doctors, 3)
+    first = client.get('/get_status?limit=2').get_json()
+    second = client.get('/get_status', query_string={'limit': 2, 'cursor': first['next']}).get_json()
+
+    assert [doctor['id'] for doctor in first['details'] + second['details']] == [1, 2, 3]
+    assert second['next'] is None
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=101', 'cursor=nope'])
+def test_get_status_rejects_bad_paging(client, query):
+    assert client.get(f'/get_status?{query}').status_code == 400
+
+
+def test_verifying_a_doctor_lists_them_at_once(client, db):
+    db.doctors.insert_one({'email': 'new@example.com', 'verified': False})
+    assert client.get('/get_status').get_json()['details'] == []
+
+    client.post('/verify', json={'email': 'new@example.com'})
+    assert [doctor['email'] for doctor in client.get('/get_status').get_json()['details']] == ['new@example.com']
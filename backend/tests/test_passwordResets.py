@@ -0,0 +1,84 @@
+import datetime
+
+import pytest
+
+from utils.mongoIndexes import INDEXES, ensure_indexes, query_shapes
+
+mongomock = pytest.importorskip('mongomock')
+
+
+def test_every_index_is_created_once():
+    mongo = mongomock.MongoClient().get_database('telmedsphere')
+
+    assert ensure_indexes(mongo) == []
+    assert ensure_indexes(mongo) == []
+    for collection, indexes in INDEXES.items():
+        assert {options['name'] for _, options in indexes} <= set(mongo[collection].index_information())
+    ttl = mongo.password_resets.index_information()['expires_at_ttl']
+    assert ttl['key'] == [('expires_at', 1)]
+    assert ttl['expireAfterSeconds'] == 0
+
+
+def test_duplicate_emails_are_reported_instead_of_raised():
+    mongo = mongomock.MongoClient().get_database('telmedsphere')
+    mongo.patients.insert_many([{'email': 'twice@example.com'}, {'email': 'twice@example.com'}])
+
+    assert ensure_indexes(mongo) == ['patients.email_unique']
+
+
+def test_every_collection_with_indexes_has_a_query_shape():
+    assert {collection for collection, _ in query_shapes()} >= set(INDEXES)
+
+
+@pytest.fixture
+def sent(backend, monkeypatch):
+    messages = []
+    monkeypatch.setattr(backend.mail, 'send', messages.append)
+    return messages
+
+
+def register_patient(db, backend, email, password):
+    db.users.insert_one({'_id': email, 'role': 'patient'})
+    db.patients.insert_one({'email': email, 'passwd': backend.bcrypt.generate_password_hash(password).decode()})
+
+
+def test_reset_token_is_mailed_stored_and_used_once(client, db, backend, sent):
+    register_patient(db, backend, 'pat@example.com', 'old')
+
+    response = client.post('/forgot_password', json={'email': 'pat@example.com'})
+    assert response.status_code == 200
+    reset = db.password_resets.find_one()
+    assert reset['email'] == 'pat@example.com'
+    assert reset['expires_at'] > datetime.datetime.utcnow() + datetime.timedelta(minutes=59)
+    assert sent[0].recipients == ['pat@example.com']
+    assert reset['_id'] in sent[0].body
+
+    response = client.post(f"/reset_password/{reset['_id']}", json={'password': 'new'})
+    assert response.status_code == 200
+    stored = db.patients.find_one({'email': 'pat@example.com'})['passwd']
+    assert backend.bcrypt.check_password_hash(stored, 'new')
+    assert db.password_resets.count_documents({}) == 0
+
+    response = client.post(f"/reset_password/{reset['_id']}", json={'password': 'again'})
+    assert response.status_code == 400
+
+
+def test_expired_token_is_refused(client, db, backend):
+    register_patient(db, backend, 'pat@example.com', 'old')
+    # Not yet removed by the TTL monitor, which runs about once a minute
+    db.password_resets.insert_one({'_id': 'stale', 'email': 'pat@example.com',
+                                   'expires_at': datetime.datetime.utcnow() - datetime.timedelta(seconds=1)})
+
+    response = client.post('/reset_password/stale', json={'password': 'new'})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'message': 'The reset link is invalid or has expired'}
+    assert backend.bcrypt.check_password_hash(db.patients.find_one()['passwd'], 'old')
+
+
+def test_reset_of_an_unknown_account_is_refused(client, db, sent):
+    response = client.post('/forgot_password', json={'email': 'nobody@example.com'})
+
+    assert response.status_code == 404
+    assert db.password_resets.count_documents({}) == 0
+    assert sent == []
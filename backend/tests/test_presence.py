@@ -0,0 +1,101 @@
+import json
+import threading
+
+import pytest
+
+from utils.presence import PresenceBroadcaster
+
+
+def events(frames):
+    """Parses SSE frames into (id, event, data) tuples."""
+    parsed = []
+    for frame in frames:
+        for block in frame.split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and line[0] != ':')
+            if 'event' in fields:
+                parsed.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return parsed
+
+
+def test_stream_delivers_deltas_published_after_it_opened():
+    presence = PresenceBroadcaster()
+    presence.publish('old@example.com', 'online', False)
+    stream = presence.stream(heartbeat=5)
+    assert next(stream) == 'retry: 3000\n\n'
+
+    threading.Timer(0.05, presence.publish, args=('doc@example.com', 'online', True)).start()
+    assert events([next(stream)]) == [(2, 'presence', {'email': 'doc@example.com', 'status': 'online',
+                                                        'isInMeet': True})]
+
+
+def test_reconnecting_client_receives_what_it_missed():
+    presence = PresenceBroadcaster()
+    for status in ('online', 'offline', 'online'):
+        presence.publish('doc@example.com', status, False)
+
+    stream = presence.stream(last_event_id='1', heartbeat=0.01)
+    next(stream)
+    assert [(event_id, data['status']) for event_id, _, data in events([next(stream)])] == [(2, 'offline'),
+                                                                                            (3, 'online')]
+
+
+def test_client_too_far_behind_is_told_to_reload():
+    presence = PresenceBroadcaster(history=2)
+    for _ in range(4):
+        presence.publish('doc@example.com', 'online', False)
+
+    stream = presence.stream(last_event_id='1', heartbeat=0.01)
+    next(stream)
+    assert events([next(stream)]) == [(4, 'reset', {})]
+
+
+def test_idle_stream_sends_keep_alives_until_its_lifetime_ends():
+    stream = PresenceBroadcaster().stream(heartbeat=0.01, lifetime=0.05)
+    frames = list(stream)
+
+    assert frames[0] == 'retry: 3000\n\n'
+    assert set(frames[1:]) == {': keep-alive\n\n'}
+
+
+@pytest.mark.parametrize('last_event_id', ['garbage', '99'])
+def test_unusable_last_event_id_starts_from_now(last_event_id):
+    presence = PresenceBroadcaster()
+    presence.publish('doc@example.com', 'online', False)
+    stream = presence.stream(last_event_id=last_event_id, heartbeat=0.01)
+    next(stream)
+
+    assert next(stream) == ': keep-alive\n\n'
+
+
+def test_subscribers_are_limited():
+    presence = PresenceBroadcaster(max_subscribers=1)
+
+    assert presence.acquire()
+    assert not presence.acquire()
+    presence.release()
+    assert presence.acquire()
+
+
+def test_stream_route_is_refused_once_full(client, backend, monkeypatch):
+    monkeypatch.setattr(backend.presence, 'max_subscribers', backend.presence.subscribers)
+    response = client.get('/presence/stream')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+
+
+def test_stream_route_sends_status_changes(client, backend, db):
+    db.doctors.insert_one({'email': 'doc@example.com', 'status': 'online'})
+    response = client.get('/presence/stream', buffered=False)
+    assert response.headers['Content-Type'].startswith('text/event-stream')
+    assert response.headers['Cache-Control'] == 'no-cache'
+    frames = (frame.decode() for frame in response.response)
+    assert next(frames) == 'retry: 3000\n\n'
+
+    client.put('/doc_status', json={'email': 'doc@example.com'})
+    delta = events([next(frames)])[-1]
+    assert delta[1:] == ('presence', {'email': 'doc@example.com', 'status': 'offline', 'isInMeet': False})
+
+    subscribers = backend.presence.subscribers
+    response.close()
+    assert backend.presence.subscribers == subscribers - 1
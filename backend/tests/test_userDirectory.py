@@ -0,0 +1,102 @@
+import pytest
+
+from utils.userDirectory import BACKFILL_MARKER, UserDirectory
+
+mongomock = pytest.importorskip('mongomock')
+
+
+@pytest.fixture
+def mongo():
+    return mongomock.MongoClient().get_database('telmedsphere')
+
+
+def directory(mongo, **kwargs):
+    return UserDirectory(mongo.users, {'patient': mongo.patients, 'doctor': mongo.doctors}, **kwargs)
+
+
+def test_accounts_from_before_the_lookup_collection_are_found_and_recorded(mongo):
+    mongo.doctors.insert_one({'email': 'doc@example.com'})
+    users = directory(mongo)
+
+    assert users.role('doc@example.com') == 'doctor'
+    assert mongo.users.find_one({'_id': 'doc@example.com'}) == {'_id': 'doc@example.com', 'role': 'doctor'}
+    assert users.role('nobody@example.com') is None
+
+
+def test_after_the_backfill_only_the_lookup_collection_is_read(mongo):
+    mongo.patients.insert_one({'email': 'pat@example.com', 'cart': [1]})
+    users = directory(mongo)
+    users.backfill()
+    assert mongo.users.find_one({'_id': BACKFILL_MARKER})
+
+    # Not claimed, so never found once the directory is complete
+    mongo.doctors.insert_one({'email': 'late@example.com'})
+    assert users.role('late@example.com') is None
+
+    role, collection, document = users.find('pat@example.com', {'cart': 1})
+    assert (role, collection.name, document['cart']) == ('patient', 'patients', [1])
+    assert 'email' not in document
+
+
+def test_an_email_can_be_claimed_once(mongo):
+    users = directory(mongo)
+
+    assert users.claim('new@example.com', 'patient')
+    assert not users.claim('new@example.com', 'doctor')
+    users.release('new@example.com')
+    assert users.claim('new@example.com', 'doctor')
+    assert users.role('new@example.com') == 'doctor'
+
+
+def test_find_of_an_unknown_account_returns_nothing(mongo):
+    users = directory(mongo)
+    # Claimed, but creating the account itself has not finished
+    users.claim('half@example.com', 'patient')
+
+    assert users.find('half@example.com') == (None, None, None)
+    assert users.find('nobody@example.com') == (None, None, None)
+    assert users.collection('nobody@example.com') is None
+
+
+def test_cache_keeps_at_most_cache_size_emails(mongo):
+    users = directory(mongo, cache_size=2)
+    for i in range(3):
+        users.claim(f'{i}@example.com', 'patient')
+
+    assert list(users._roles) == ['1@example.com', '2@example.com']
+    assert users.role('0@example.com') == 'patient'
+
+
+def register_patient(db, email, **fields):
+    db.users.insert_one({'_id': email, 'role': 'patient'})
+    db.patients.insert_one({'email': email, **fields})
+
+
+@pytest.mark.parametrize('route, payload', [
+    ('/get_orders', {}),
+    ('/get_cart', {}),
+    ('/get_wallet', {}),
+    ('/get_wallet_history', {}),
+    ('/add_order', {'orders': []}),
+    ('/wallet', {'walletAmount': 10}),
+    ('/add_to_cart', {'cart': []}),
+])
+def test_routes_answer_404_for_unknown_accounts(client, route, payload):
+    response = client.post(route, json={'email': 'nobody@example.com', **payload})
+
+    assert response.status_code == 404
+    assert response.get_json() == {'message': 'User not found'}
+
+
+def test_routes_read_and_write_the_accounts_own_collection(client, db):
+    register_patient(db, 'pat@example.com', wallet=5, cart=[{'id': 1, 'quantity': 1}])
+
+    assert client.post('/wallet', json={'email': 'pat@example.com', 'walletAmount': 10}).status_code == 200
+    assert client.post('/get_wallet', json={'email': 'pat@example.com'}).get_json()['wallet'] == 15
+    assert client.post('/get_cart', json={'email': 'pat@example.com'}).get_json()['cart'] == [{'id': 1, 'quantity': 1}]
+    assert db.doctors.count_documents({}) == 0
+
+
+def test_login_of_an_unknown_account_is_refused(client):
+    response = client.post('/login', json={'email': 'nobody@example.com', 'passwd': 'secret'})
+    assert response.status_code == 401
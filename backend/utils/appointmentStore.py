@@ -0,0 +1,210 @@
+"""
+Appointments stored one document per meeting link instead of as arrays
+embedded in the patient and doctor documents.
+
+    {_id: link, link, demail, pemail, date, time, doctor, patient,
+     status: 'upcoming' | 'completed', stars, prescription, created_at}
+
+Booking, rating and attaching a prescription each touch a single small
+document, and a user's appointments are read through the (demail, status)
+and (pemail, status) indexes.
+
+Embedded entries recorded no booking time, only their place in the user's
+array. Migrated appointments are stamped one millisecond (the resolution of
+a BSON date) apart, ending at the migration time, in an order that agrees
+with every user's arrays, so they keep their listing order and sort before
+anything booked afterwards.
+
+Usage (from the backend directory, with DBURL set), copies the embedded
+upcomingAppointments / completedMeets arrays into the collection:
+    python -m utils.appointmentStore migrate [--unset]
+"""
+import argparse
+import datetime
+import heapq
+import os
+
+import pymongo
+
+UPCOMING = 'upcoming'
+COMPLETED = 'completed'
+
+# Fields handed to the frontend, in the shape the embedded entries had
+PUBLIC_PROJECTION = {'_id': 0, 'status': 0, 'created_at': 0}
+
+# Recorded in the migrations collection once the embedded arrays have been copied
+MIGRATION_ID = 'embedded_appointments'
+
+
+class AppointmentStore:
+    """
+    Reads and writes appointments by meeting link.
+    """
+
+    def __init__(self, collection):
+        """
+        :param collection: Appointments collection
+        """
+        self.collection = collection
+
+    def book(self, link, **fields):
+        """
+        Creates the appointment of a meeting link, or adds fields to it when the
+        other participant's side booked it first.
+
+        :param link: Meeting link (str)
+        :param fields: Appointment fields such as demail, pemail, date, time, doctor, patient
+        """
+        self.collection.update_one(
+            {'_id': link},
+            {'$set': {'link': link, **fields},
+             '$setOnInsert': {'status': UPCOMING, 'created_at': datetime.datetime.utcnow()}},
+            upsert=True,
+        )
+
+    def listed(self, role_field, email, status):
+        """
+        :param role_field: 'demail' or 'pemail'
+        :param email: Email of the doctor or patient
+        :param status: UPCOMING or COMPLETED
+        :return: List of appointment dicts, oldest booking first
+        """
+        found = self.collection.find({role_field: email, 'status': status}, PUBLIC_PROJECTION)
+        return list(found.sort('created_at', pymongo.ASCENDING))
+
+    def complete(self, link, pemail, demail, stars):
+        """
+        Marks an upcoming appointment as completed with the patient's rating.
+        Completes at most once, so a repeated rating is not counted twice.
+
+        :return: False if no such upcoming appointment exists
+        """
+        result = self.collection.update_one(
+            {'_id': link, 'pemail': pemail, 'demail': demail, 'status': UPCOMING},
+            {'$set': {'status': COMPLETED, 'stars': stars}},
+        )
+        return result.matched_count > 0
+
+    def attach_prescription(self, link, url):
+        """
+        :return: True if the appointment exists
+        """
+        return self.collection.update_one({'_id': link}, {'$set': {'prescription': url}}).matched_count > 0
+
+
+def _embedded(db):
+    """
+    Yields (owner field, user document, status, entry) for every embedded
+    appointment, upcoming before completed for each user.
+    """
+    projection = {'email': 1, 'upcomingAppointments': 1, 'completedMeets': 1}
+    for owner_field, collection in (('demail', db.doctors), ('pemail', db.patients)):
+        for user in collection.find({}, projection):
+            for status, key in ((UPCOMING, 'upcomingAppointments'), (COMPLETED, 'completedMeets')):
+                for entry in user.get(key) or []:
+                    yield owner_field, user, status, entry
+
+
+def booking_order(arrays):
+    """
+    Ranks links so that each array lists its links in rank order. Every user's
+    array was appended to as appointments were booked, so such a ranking exists
+    unless the arrays contradict each other.
+
+    :param arrays: Lists of links, each in the order one user's array held them
+    :return: Dict of link -> rank (int)
+    """
+    first_seen, later, waiting = {}, {}, {}
+    for links in arrays:
+        for link in links:
+            if link not in first_seen:
+                first_seen[link] = len(first_seen)
+                later[link], waiting[link] = set(), 0
+        for before, after in zip(links, links[1:]):
+            if before != after and after not in later[before]:
+                later[before].add(after)
+                waiting[after] += 1
+
+    # Links no array puts after another are taken in the order they were first seen
+    ready = [(first_seen[link], link) for link, count in waiting.items() if not count]
+    heapq.heapify(ready)
+    rank = {}
+    while ready:
+        _, link = heapq.heappop(ready)
+        rank[link] = len(rank)
+        for after in later[link]:
+            waiting[after] -= 1
+            if not waiting[after]:
+                heapq.heappush(ready, (first_seen[after], after))
+
+    # Arrays that contradict each other leave a cycle, ranked by first sight
+    for link in sorted(first_seen.keys() - rank.keys(), key=first_seen.get):
+        rank[link] = len(rank)
+    return rank
+
+
+def migrate_embedded(db, unset=False):
+    """
+    Copies every embedded appointment into the appointments collection. Safe to
+    run again: appointments are upserted by link, keep the created_at of the
+    first run, and entries without a link are skipped.
+
+    :param db: pymongo Database
+    :param unset: Also remove the embedded arrays from the user documents (bool)
+    :return: (appointments written, entries skipped)
+    """
+    started = datetime.datetime.utcnow()
+    entries = list(_embedded(db))
+    arrays = {}
+    for owner_field, user, status, entry in entries:
+        if entry.get('link'):
+            arrays.setdefault((owner_field, user['_id'], status), []).append(entry['link'])
+    rank = booking_order(arrays.values())
+
+    written = skipped = 0
+    # Upcoming first, so an appointment listed under both ends up completed
+    for owner_field, user, status, entry in entries:
+        link = entry.get('link')
+        if not link:
+            skipped += 1
+            continue
+        fields = {k: v for k, v in entry.items() if k not in ('_id', 'status')}
+        fields[owner_field] = user['email']
+        # Ends at the migration start, ahead of anything booked while it runs
+        created_at = started - datetime.timedelta(milliseconds=len(rank) - rank[link])
+        update = {'$set': {**fields, 'link': link}, '$setOnInsert': {'created_at': created_at}}
+        if status == COMPLETED:
+            update['$set']['status'] = COMPLETED
+        else:
+            update['$setOnInsert']['status'] = UPCOMING
+        db.appointments.update_one({'_id': link}, update, upsert=True)
+        written += 1
+    if unset:
+        for collection in (db.doctors, db.patients):
+            collection.update_many({}, {'$unset': {'upcomingAppointments': '', 'completedMeets': ''}})
+    db.migrations.update_one({'_id': MIGRATION_ID}, {'$set': {'finished_at': datetime.datetime.utcnow()}}, upsert=True)
+    return written, skipped
+
+
+def migrate_once(db):
+    """
+    Runs migrate_embedded unless it has finished before.
+
+    :param db: pymongo Database
+    """
+    if not db.migrations.find_one({'_id': MIGRATION_ID}):
+        migrate_embedded(db)
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Move embedded appointments into their own collection")
+    parser.add_argument('command', choices=['migrate'])
+    parser.add_argument('--unset', action='store_true', help='Remove the embedded arrays afterwards')
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = pymongo.MongoClient(os.getenv('DBURL')).get_database('telmedsphere')
+    written, skipped = migrate_embedded(db, unset=args.unset)
+    print(f"Wrote {written} appointments, skipped {skipped} entries without a link")
@@ -0,0 +1,117 @@
+import threading
+import time
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Only the fields the directory shows; appointment, wallet, cart and order arrays stay on the server
+PROJECTION = {'email': 1, 'status': 1, 'username': 1, 'specialization': 1, 'gender': 1, 'phone': 1,
+              'meet': 1, 'appointments': 1, 'stars': 1, 'fee': 1}
+
+
+def encode_cursor(last_id, count):
+    return f"{last_id}.{count}"
+
+
+def decode_cursor(cursor):
+    """
+    :param cursor: Value of `next` from a previous page
+    :return: (last ObjectId, doctors listed so far), or (None, 0) for the first page
+    :raises ValueError: If the cursor is malformed
+    """
+    if not cursor:
+        return None, 0
+    last_id, _, count = cursor.partition('.')
+    try:
+        return ObjectId(last_id), int(count)
+    except (InvalidId, TypeError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+
+
+class DoctorDirectory:
+    """
+    Verified doctors as listed by /get_status, read with the filter and a
+    field projection applied by MongoDB and paged by _id.
+
+    Pages are cached for a few seconds, and the cache is cleared whenever a
+    route changes a doctor. Other workers see the change once their own
+    entries expire.
+    """
+
+    def __init__(self, collection, ttl_seconds=5.0, max_entries=256):
+        """
+        :param collection: Doctors collection
+        :param ttl_seconds: Seconds a page is served from the cache (float)
+        :param max_entries: Most pages kept in the cache (int)
+        """
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._pages = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._pages.clear()
+
+    def page(self, specialization=None, cursor=None, limit=None):
+        """
+        :param specialization: Only list doctors with this specialization (optional)
+        :param cursor: `next` of the previous page, None for the first page
+        :param limit: Most doctors per page (int), None to list all
+        :return: Dict with the `details` of each doctor and the `next` cursor (None on the last page)
+        :raises ValueError: If the cursor is malformed
+        """
+        key = (specialization, cursor, limit)
+        now = time.monotonic()
+        cached = self._pages.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        generation = self._generation
+        result = self._load(specialization, cursor, limit)
+        with self._lock:
+            # A doctor changed while loading; the next request reads again
+            if generation == self._generation:
+                if len(self._pages) >= self.max_entries:
+                    self._pages.clear()
+                self._pages[key] = (now + self.ttl_seconds, result)
+        return result
+
+    def _load(self, specialization, cursor, limit):
+        last_id, count = decode_cursor(cursor)
+        query = {'verified': True}
+        if specialization:
+            query['specialization'] = specialization
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+
+        found = self.collection.find(query, PROJECTION).sort('_id', 1)
+        if limit:
+            # One extra document tells whether there is another page
+            found = found.limit(limit + 1)
+        doctors = list(found)
+
+        next_cursor = None
+        if limit and len(doctors) > limit:
+            doctors = doctors[:limit]
+            next_cursor = encode_cursor(doctors[-1]['_id'], count + limit)
+
+        details = []
+        for position, doc in enumerate(doctors, start=count + 1):
+            details.append({
+                "email": doc["email"],
+                "status": doc.get("status", "offline"),
+                "username": doc.get("username"),
+                "specialization": doc.get("specialization"),
+                "gender": doc.get("gender"),
+                "phone": doc.get("phone"),
+                "isInMeet": doc.get("meet", False),
+                "noOfAppointments": doc.get("appointments", 0),
+                "noOfStars": doc.get("stars", 0),
+                "id": position,
+                "fee": doc.get("fee", 199),
+            })
+        return {"details": details, "next": next_cursor}
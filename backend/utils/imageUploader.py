@@ -3,6 +3,8 @@ import cloudinary.uploader
 import os
 from dotenv import load_dotenv
 
+from utils.metrics import timed
+
 load_dotenv()
 
 # Configure Cloudinary
@@ -21,7 +23,8 @@ def upload_file(file_path, folder="TelMedSphere"):
     :return: Secure URL of the uploaded file
     """
     try:
-        response = cloudinary.uploader.upload(file_path, folder=folder)
+        with timed('cloudinary', 'upload'):
+            response = cloudinary.uploader.upload(file_path, folder=folder)
         return response["secure_url"]
     except Exception as e:
         return str(e)
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+Structured, non-blocking logging.
+
+Records are put on a bounded in-memory queue by the request threads and
+written as one JSON object per line by a background listener thread, so a
+handler never blocks on stdout. As with the standard QueueHandler, the
+message and any traceback are rendered before a record is queued, so the
+listener never touches the caller's arguments or exception. When the queue
+is full records are dropped and counted instead of waiting. Per-route
+sampling keeps high-volume routes from flooding the output.
+
+Environment:
+    LOG_LEVEL          DEBUG, INFO (default), WARNING, ...
+    LOG_SAMPLE_RATES   per-route request log rates, e.g. "/predict=0.05,/predict/batch=1"
+    LOG_SAMPLE_DEFAULT rate for routes not listed (default 1)
+    LOG_QUEUE_SIZE     records buffered before dropping (default 10000)
+
+The models and backend services are deployed from their own directories, so
+each ships a copy of this module; models/utils/logs.py and backend/utils/logs.py
+must stay identical (checked by models/tests/test_sharedModules.py).
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+_listener = None
+_handler = None
+_sample_rates = {}
+_default_rate = 1.0
+
+# Attributes every LogRecord carries; anything else was passed through extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+_FORMATTER = JsonFormatter()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that never blocks: records are dropped when the queue is
+    full. The JSON line itself is built by the listener thread.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Like QueueHandler.prepare, but the traceback is kept out of the
+        # message so that the listener writes it to its own field
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _parse_rates(spec):
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        route, _, rate = item.partition('=')
+        rates[route.strip()] = float(rate)
+    return rates
+
+
+def _start_listener():
+    global _listener
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = QueueListener(_handler.queue, stream, respect_handler_level=False)
+    _listener.start()
+
+
+def _stop_listener():
+    # Drains what is already queued before the interpreter exits
+    try:
+        _listener.stop()
+    except queue.Full:
+        pass
+
+
+def _restart_after_fork():
+    # The parent's listener may have held the queue's lock at fork time
+    _handler.queue = queue.Queue(maxsize=_handler.queue.maxsize)
+    _start_listener()
+
+
+def setup_logging(level=None, sample_rates=None, queue_size=None):
+    """
+    Routes all logging through the background writer. Safe to call more than once.
+
+    :param level: Root log level name, defaults to LOG_LEVEL
+    :param sample_rates: Mapping of route -> share of requests logged, defaults to LOG_SAMPLE_RATES
+    :param queue_size: Records buffered before dropping, defaults to LOG_QUEUE_SIZE
+    """
+    global _handler, _default_rate, _sample_rates
+    level = level or os.environ.get('LOG_LEVEL', 'INFO')
+    _sample_rates = sample_rates if sample_rates is not None else _parse_rates(os.environ.get('LOG_SAMPLE_RATES', ''))
+    _default_rate = float(os.environ.get('LOG_SAMPLE_DEFAULT', 1))
+
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    if _handler is not None:
+        return
+
+    size = queue_size or int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=size))
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    _start_listener()
+    atexit.register(_stop_listener)
+    # The listener thread does not survive fork, so (gunicorn) workers start their own
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def should_sample(route):
+    """
+    :param route: Route rule, e.g. '/predict'
+    :return: True if this request should be logged
+    """
+    rate = _sample_rates.get(route, _default_rate)
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def log_request(logger, route, status, started, **fields):
+    """
+    Writes one sampled summary line for a finished request.
+
+    :param logger: Logger to write to
+    :param route: Route rule the request matched
+    :param status: HTTP status code (int)
+    :param started: time.perf_counter() value taken when the request began
+    """
+    if should_sample(route):
+        logger.info('request', extra={
+            'route': route,
+            'status': status,
+            'latency_ms': round((time.perf_counter() - started) * 1000.0, 3),
+            **fields,
+        })
+
+
+def dropped_records():
+    """
+    :return: Number of records dropped because the queue was full
+    """
+    return _handler.dropped if _handler else 0
@@ -0,0 +1,143 @@
+"""
+MongoDB index provisioning and query-plan verification.
+
+INDEXES lists every index the routes rely on; ensure_indexes creates the
+missing ones (create_index is a no-op for an index that already exists) and
+runs at backend startup. query_shapes returns one example of every filter the
+routes issue; verify_query_plans explains each of them and reports the ones
+the server would answer with a collection scan.
+
+Usage (from the backend directory, with DBURL set):
+    python -m utils.mongoIndexes migrate
+    python -m utils.mongoIndexes verify     # exits with 1 if any query is a COLLSCAN
+"""
+import datetime
+import logging
+import os
+import sys
+
+import pymongo
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Reset tokens are deleted by the server once expires_at has passed
+PASSWORD_RESET_TTL_SECONDS = 0
+
+# collection -> [(keys, options)]; _id is always indexed by MongoDB
+INDEXES = {
+    'patients': [
+        ([('email', pymongo.ASCENDING)], {'name': 'email_unique', 'unique': True}),
+    ],
+    'doctors': [
+        ([('email', pymongo.ASCENDING)], {'name': 'email_unique', 'unique': True}),
+        # /get_status pages through verified doctors by _id, optionally per specialization
+        ([('verified', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)], {'name': 'verified_id'}),
+        ([('verified', pymongo.ASCENDING), ('specialization', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)],
+         {'name': 'verified_specialization_id'}),
+    ],
+    # Keyed by meeting link; listed per participant and status in booking order
+    'appointments': [
+        ([('demail', pymongo.ASCENDING), ('status', pymongo.ASCENDING), ('created_at', pymongo.ASCENDING)],
+         {'name': 'doctor_status_created'}),
+        ([('pemail', pymongo.ASCENDING), ('status', pymongo.ASCENDING), ('created_at', pymongo.ASCENDING)],
+         {'name': 'patient_status_created'}),
+    ],
+    'password_resets': [
+        ([('expires_at', pymongo.ASCENDING)], {'name': 'expires_at_ttl',
+                                               'expireAfterSeconds': PASSWORD_RESET_TTL_SECONDS}),
+    ],
+}
+
+
+def query_shapes():
+    """
+    :return: List of (collection, filter) pairs, one per distinct query the routes issue
+    """
+    email, link, now = 'shape@example.com', 'https://meet.example.com/shape', datetime.datetime.utcnow()
+    shapes = []
+    for name in ('patients', 'doctors'):
+        shapes += [
+            (name, {'email': email}),
+            (name, {'email': {'$in': [email]}}),
+        ]
+    return shapes + [
+        ('doctors', {'verified': True, '_id': {'$gt': ObjectId()}}),
+        ('doctors', {'verified': True, 'specialization': 'shape', '_id': {'$gt': ObjectId()}}),
+        ('appointments', {'_id': link}),
+        ('appointments', {'_id': link, 'pemail': email, 'demail': email, 'status': 'upcoming'}),
+        ('appointments', {'demail': email, 'status': 'upcoming'}),
+        ('appointments', {'pemail': email, 'status': 'completed'}),
+        ('migrations', {'_id': 'shape'}),
+        ('users', {'_id': email}),
+        ('password_resets', {'_id': 'token', 'expires_at': {'$gt': now}}),
+        ('website_feedback', {'_id': ObjectId()}),
+    ]
+
+
+def ensure_indexes(db):
+    """
+    Creates every index in INDEXES that does not exist yet.
+
+    :param db: pymongo Database
+    :return: Names of the indexes that could not be created (list)
+    """
+    failed = []
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                # e.g. duplicate emails already stored, which block a unique index
+                logger.error("Could not create index", extra={'collection': collection, 'index': options['name'],
+                                                               'error': str(e)})
+                failed.append(f"{collection}.{options['name']}")
+    return failed
+
+
+def _stages(plan):
+    yield plan.get('stage')
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get('inputStages', []) + plan.get('shards', []):
+        yield from _stages(child.get('winningPlan', child))
+
+
+def verify_query_plans(db):
+    """
+    Explains every query shape and collects the ones planned as collection scans.
+
+    :param db: pymongo Database
+    :return: List of (collection, filter, stages) for every COLLSCAN
+    """
+    scans = []
+    for collection, query in query_shapes():
+        plan = db[collection].find(query).explain()['queryPlanner']['winningPlan']
+        stages = [stage for stage in _stages(plan) if stage]
+        if 'COLLSCAN' in stages:
+            scans.append((collection, query, stages))
+    return scans
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    db = pymongo.MongoClient(os.getenv('DBURL')).get_database('telmedsphere')
+
+    if command == 'migrate':
+        failed = ensure_indexes(db)
+        for name in failed:
+            print(f"Could not create index {name}")
+        sys.exit(1 if failed else 0)
+    elif command == 'verify':
+        scans = verify_query_plans(db)
+        for collection, query, stages in scans:
+            print(f"COLLSCAN on {collection}: {query} ({' <- '.join(stages)})")
+        print(f"{len(query_shapes()) - len(scans)} of {len(query_shapes())} query shapes use an index")
+        sys.exit(1 if scans else 0)
+    else:
+        sys.exit(f"Unknown command {command}, expected migrate or verify")
@@ -0,0 +1,144 @@
+"""
+Doctor presence broadcast over Server-Sent Events.
+
+Routes that change a doctor's status or in-meet flag publish a delta; every
+open /presence/stream connection receives it as one SSE event. Deltas carry a
+sequence number as the event id and the last few hundred are kept, so a
+client reconnecting with Last-Event-ID receives what it missed. A client that
+fell further behind receives a `reset` event and reloads /get_status once.
+
+Deltas are broadcast within one process. With several workers, set
+PRESENCE_CHANGE_STREAM=1 so that every worker follows a MongoDB change stream
+on the doctors collection instead (this needs a replica set).
+
+Every open stream occupies a worker thread, so the backend should run with
+threaded workers (e.g. gunicorn --worker-class gthread --threads N).
+"""
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceBroadcaster:
+    """
+    Fans presence deltas out to the open streams of this process.
+    """
+
+    def __init__(self, history=512, max_subscribers=200):
+        """
+        :param history: Deltas kept for clients that reconnect (int)
+        :param max_subscribers: Most streams open at once (int)
+        """
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self._history = deque(maxlen=history)
+        self._sequence = itertools.count(1)
+        self._changed = threading.Condition()
+
+    def publish(self, email, status, in_meet):
+        """
+        :param email: Doctor email
+        :param status: 'online' or 'offline'
+        :param in_meet: Whether the doctor is in a meeting (bool)
+        """
+        with self._changed:
+            event_id = next(self._sequence)
+            self._history.append((event_id, json.dumps({'email': email, 'status': status, 'isInMeet': bool(in_meet)})))
+            self._changed.notify_all()
+
+    def _since(self, last_id):
+        """
+        :return: Deltas after last_id, or None if some of them were already dropped
+        """
+        if not self._history or last_id >= self._history[-1][0]:
+            return []
+        if last_id < self._history[0][0] - 1:
+            return None
+        return [entry for entry in self._history if entry[0] > last_id]
+
+    def acquire(self):
+        """
+        Reserves a subscriber slot.
+
+        :return: True if a stream may be opened
+        """
+        with self._changed:
+            if self.subscribers >= self.max_subscribers:
+                return False
+            self.subscribers += 1
+            return True
+
+    def release(self):
+        with self._changed:
+            self.subscribers -= 1
+
+    def stream(self, last_event_id=None, heartbeat=15.0, lifetime=300.0):
+        """
+        Yields SSE frames until `lifetime` seconds have passed; the browser then
+        reconnects with Last-Event-ID. The caller holds a slot from acquire()
+        and releases it once the response is closed.
+
+        :param last_event_id: Last-Event-ID header of a reconnecting client (str)
+        :param heartbeat: Seconds between keep-alive comments (float)
+        :param lifetime: Seconds before the stream is closed (float)
+        """
+        with self._changed:
+            current = self._history[-1][0] if self._history else 0
+        try:
+            last_id = int(last_event_id) if last_event_id else current
+        except ValueError:
+            last_id = current
+        if last_id > current:
+            # Ids handed out before this process restarted
+            last_id = current
+        yield 'retry: 3000\n\n'
+
+        deadline = time.monotonic() + lifetime
+        while time.monotonic() < deadline:
+            with self._changed:
+                pending = self._since(last_id)
+                if pending == []:
+                    self._changed.wait(heartbeat)
+                    pending = self._since(last_id)
+                newest = self._history[-1][0] if self._history else 0
+            if pending is None:
+                last_id = newest
+                yield f'id: {newest}\nevent: reset\ndata: {{}}\n\n'
+            elif pending:
+                last_id = pending[-1][0]
+                yield ''.join(f'id: {event_id}\nevent: presence\ndata: {data}\n\n' for event_id, data in pending)
+            else:
+                yield ': keep-alive\n\n'
+
+
+def follow_change_stream(collection, broadcaster, retry_seconds=5.0):
+    """
+    Publishes every change of a doctor's status or in-meet flag seen on the
+    collection's change stream. Runs forever; start it on a daemon thread.
+
+    :param collection: Doctors collection
+    :param broadcaster: PresenceBroadcaster
+    :param retry_seconds: Pause before reopening a failed stream (float)
+    """
+    pipeline = [{'$match': {
+        'operationType': 'update',
+        '$or': [{'updateDescription.updatedFields.status': {'$exists': True}},
+                {'updateDescription.updatedFields.meet': {'$exists': True}}],
+    }}]
+    resume_token = None
+    while True:
+        try:
+            with collection.watch(pipeline, full_document='updateLookup', resume_after=resume_token) as changes:
+                for change in changes:
+                    resume_token = changes.resume_token
+                    doc = change.get('fullDocument')
+                    if doc:
+                        broadcaster.publish(doc['email'], doc.get('status', 'offline'), doc.get('meet', False))
+        except Exception:
+            logger.exception("Presence change stream failed")
+            time.sleep(retry_seconds)
@@ -0,0 +1,128 @@
+import threading
+
+from pymongo.errors import DuplicateKeyError
+
+# Marker document written once every existing account has been copied into the lookup collection
+BACKFILL_MARKER = '__backfilled__'
+
+
+class UserDirectory:
+    """
+    Resolves an email to the role and collection of its account, so a route
+    queries the right collection once instead of probing patients and then
+    doctors.
+
+    Roles live in a lookup collection keyed by email (_id, so unique across
+    both roles) and are cached in-process. An account never changes role, so
+    cached entries stay valid; unknown emails are not cached, so an account
+    registered through another worker is found on its next lookup.
+    """
+
+    def __init__(self, lookup, collections, cache_size=100_000):
+        """
+        :param lookup: Collection holding {_id: email, role: role} documents
+        :param collections: Mapping of role -> collection of its accounts (dict)
+        :param cache_size: Most emails kept in the in-process cache (int)
+        """
+        self.lookup = lookup
+        self.collections = collections
+        self.cache_size = cache_size
+        self.complete = False
+        self._roles = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, email, role):
+        with self._lock:
+            if len(self._roles) >= self.cache_size:
+                # Oldest entry first; roles never change, so eviction only costs a lookup
+                self._roles.pop(next(iter(self._roles)))
+            self._roles[email] = role
+
+    def role(self, email):
+        """
+        :param email: Account email
+        :return: 'patient', 'doctor' or None if there is no such account
+        """
+        role = self._roles.get(email)
+        if role is not None:
+            return role
+
+        entry = self.lookup.find_one({'_id': email}, {'role': 1})
+        if entry:
+            role = entry['role']
+        elif not self.complete:
+            # Accounts created before the lookup collection existed are found by probing once
+            for candidate, collection in self.collections.items():
+                if collection.find_one({'email': email}, {'_id': 1}):
+                    role = candidate
+                    self.claim(email, role)
+                    break
+        if role is not None:
+            self._remember(email, role)
+        return role
+
+    def collection(self, email):
+        """
+        :param email: Account email
+        :return: Collection holding the account, or None if there is no such account
+        """
+        role = self.role(email)
+        return self.collections[role] if role else None
+
+    def find(self, email, projection=None):
+        """
+        Loads an account with a single query on its own collection.
+
+        :param email: Account email
+        :param projection: Optional pymongo projection
+        :return: (role, collection, document), all None if there is no such account
+        """
+        role = self.role(email)
+        if role is None:
+            return None, None, None
+        collection = self.collections[role]
+        document = collection.find_one({'email': email}, projection)
+        if document is None:
+            return None, None, None
+        return role, collection, document
+
+    def claim(self, email, role):
+        """
+        Records a new account. The unique _id makes concurrent registrations of
+        one email under either role fail here instead of creating two accounts.
+
+        :param email: Account email
+        :param role: 'patient' or 'doctor'
+        :return: True if the email was free, False if it already belongs to an account
+        """
+        try:
+            self.lookup.insert_one({'_id': email, 'role': role})
+        except DuplicateKeyError:
+            return False
+        self._remember(email, role)
+        return True
+
+    def release(self, email):
+        """
+        Drops a claim, e.g. when creating the account itself failed.
+
+        :param email: Account email
+        """
+        self.lookup.delete_one({'_id': email})
+        with self._lock:
+            self._roles.pop(email, None)
+
+    def backfill(self):
+        """
+        Copies every existing account into the lookup collection once. Until it
+        has finished, unknown emails are still probed in both collections.
+        """
+        if self.lookup.find_one({'_id': BACKFILL_MARKER}):
+            self.complete = True
+            return
+        for role, collection in self.collections.items():
+            for account in collection.find({}, {'email': 1, '_id': 0}):
+                if account.get('email'):
+                    self.lookup.update_one({'_id': account['email']}, {'$setOnInsert': {'role': role}}, upsert=True)
+        self.lookup.update_one({'_id': BACKFILL_MARKER}, {'$setOnInsert': {'role': None}}, upsert=True)
+        self.complete = True
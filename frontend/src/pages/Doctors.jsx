@@ -66,6 +66,27 @@ const Doctors = () => {
     }
   }, []);
 
+  useEffect(() => {
+    if (!localStorage.getItem("usertype")) return;
+
+    // Status and meet changes are pushed by the server, so the list stays current without refetching
+    const source = new EventSource(
+      `${httpClient.defaults.baseURL}/presence/stream`,
+      { withCredentials: true }
+    );
+    source.addEventListener("presence", (event) => {
+      const { email, status, isInMeet } = JSON.parse(event.data);
+      setDoctors((current) =>
+        current.map((doctor) =>
+          doctor.email === email ? { ...doctor, status, isInMeet } : doctor
+        )
+      );
+    });
+    // Sent when too many changes were missed to replay them
+    source.addEventListener("reset", () => fetchDoctors());
+    return () => source.close();
+  }, []);
+
   useEffect(() => {
     handleTimings();
   }, [isScheduleMeet, curDate]);
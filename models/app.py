@@ -1,23 +1,166 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, g
+from collections import Counter
 
+import hashlib
+import hmac
+import logging
 import numpy as np
-import pandas as pd
-import pickle
 import os
+import resource
+import time
 from flask_cors import CORS
+from utils.symptomIndex import build_symptom_index, build_feature_indices, build_feature_csr, indices_to_csr, normalize_symptom
+from utils.microBatcher import MicroBatcher
+from utils.diseaseInfo import load_disease_info
+from utils.ranking import top_k
+from utils.predictionCache import PredictionCache
+from utils.forestArtifact import load_model
+from utils.modelRegistry import ModelRegistry
+from utils.processPool import InferencePool
+from utils.binaryForest import compile_forest
+from utils.vocabulary import diseases, symptoms, non_symptom_columns
+from utils.severity import WeightedModel, load_severity_weights
+from utils.caseIndex import CaseIndex
+from utils.suggest import SuggestIndex
+from utils.logs import setup_logging, log_request, dropped_records
+from utils.metrics import CONTENT_TYPE, render_metrics, request_finished, request_started, timed
+
+setup_logging()
+logger = logging.getLogger('models')
 
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
 
-model = pickle.load(open('ExtraTrees', 'rb'))
+# Either the pickled estimator or a flat artifact exported by utils.forestArtifact;
+# artifacts are memory-mapped and shared between workers through the page cache
+MODEL_PATH = os.environ.get("MODEL_PATH", "ExtraTrees")
+
+# Seconds between checks of MODEL_PATH for a replaced artifact, 0 to disable
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 0))
+
+# Processes scoring requests on a shared memory-mapped artifact, 0 to score in-process
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", 0))
+
+# "severity" for models trained on severity-weighted features (utils.severity), else 0/1 flags
+FEATURE_ENCODING = os.environ.get("FEATURE_ENCODING", "binary")
+
+# Required in the X-Admin-Token header of POST /admin/model/reload; reloads are refused while unset
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Directory a reload request may pick another artifact from, defaults to the one holding MODEL_PATH
+MODEL_DIR = os.path.realpath(os.environ.get("MODEL_DIR", os.path.dirname(os.path.abspath(MODEL_PATH))))
+
+# Upper bound on rows accepted by /predict/batch in one request
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 256))
+
+# Number of diseases returned per prediction unless ?top_k= is given
+DEFAULT_TOP_K = int(os.environ.get("DEFAULT_TOP_K", 3))
+
+# Finished /predict responses keyed by symptom columns and top_k; entries are
+# dropped as soon as they are looked up under a different model version
+prediction_cache = PredictionCache(
+    max_size=int(os.environ.get("PREDICTION_CACHE_SIZE", 1024)),
+    ttl_seconds=float(os.environ.get("PREDICTION_CACHE_TTL", 3600)),
+)
+
+def predict_with_active_model(features):
+    with registry.using() as handle:
+        return handle.model.predict_proba(features)
+
+# Opt-in coalescing of concurrent /predict calls into one predict_proba call; needs
+# threaded workers, which gunicorn.conf.py switches to when MICRO_BATCHING is set
+batcher = None
+if os.environ.get("MICRO_BATCHING", "0") == "1":
+    batcher = MicroBatcher(
+        predict_with_active_model,
+        stack_fn=lambda rows: indices_to_csr(rows, len(symptoms)),
+        max_batch_size=int(os.environ.get("MICRO_BATCH_MAX_SIZE", 64)),
+        max_wait_ms=float(os.environ.get("MICRO_BATCH_WINDOW_MS", 2)),
+    )
+
+logger.info('Feature layout loaded', extra={'n_features': len(symptoms), 'n_classes': len(diseases)})
+symptom_index = build_symptom_index(symptoms)
+disease_info = load_disease_info("symptom_Description.csv", "symptom_precaution.csv", diseases)
+feature_weights = None
+if FEATURE_ENCODING == "severity":
+    feature_weights = load_severity_weights("Symptom-severity.csv", symptoms)
+
+# Distinct symptom sets of the training data; requests matching one exactly are
+# answered from a per-model-version batch of precomputed probabilities
+case_index = CaseIndex.from_csv("dataset.csv")
 
-diseases = [ '(vertigo) Paroymsal Positional Vertigo', 'AIDS', 'Acne', 'Alcoholic hepatitis', 'Allergy', 'Arthritis', 'Bronchial Asthma', 'Cervical spondylosis', 'Chicken pox', 'Chronic cholestasis', 'Common Cold', 'Dengue', 'Diabetes', 'Dimorphic hemmorhoids(piles)', 'Drug Reaction', 'Fungal infection', 'GERD', 'Gastroenteritis', 'Heart attack', 'Hepatitis B', 'Hepatitis C', 'Hepatitis D', 'Hepatitis E', 'Hypertension', 'Hyperthyroidism', 'Hypoglycemia', 'Hypothyroidism', 'Impetigo', 'Jaundice', 'Malaria', 'Migraine', 'Osteoarthristis', 'Paralysis (brain hemorrhage)', 'Peptic ulcer diseae', 'Pneumonia', 'Psoriasis', 'Tuberculosis', 'Typhoid', 'Urinary tract infection', 'Varicose veins', 'hepatitis A' ]
+# Autocomplete over the reportable symptoms, most frequently recorded first
+symptom_popularity = Counter()
+for cols, count in zip(case_index.columns, case_index.counts):
+    symptom_popularity.update({normalize_symptom(symptoms[c]): int(count) for c in cols})
+suggest_index = SuggestIndex([s for s in symptoms if s not in non_symptom_columns], popularity=symptom_popularity)
+SUGGEST_MAX_AGE = int(os.environ.get("SUGGEST_MAX_AGE", 86400))
 
-symptoms =  ['Disease', 'itching', 'skin_rash', 'nodal_skin_eruptions', 'continuous_sneezing', 'shivering', 'chills', 'joint_pain', 'stomach_pain', 'acidity', 'ulcers_on_tongue', 'muscle_wasting', 'vomiting', 'burning_micturition', 'fatigue', 'weight_gain', 'anxiety', 'cold_hands_and_feets', 'mood_swings', 'weight_loss', 'restlessness', 'lethargy', 'patches_in_throat', 'irregular_sugar_level', 'cough', 'high_fever', 'sunken_eyes', 'breathlessness', 'sweating', 'dehydration', 'indigestion', 'headache', 'yellowish_skin', 'dark_urine', 'nausea', 'loss_of_appetite', 'pain_behind_the_eyes', 'back_pain', 'constipation', 'abdominal_pain', 'diarrhoea', 'mild_fever', 'yellow_urine', 'yellowing_of_eyes', 'acute_liver_failure', 'fluid_overload', 'swelling_of_stomach', 'swelled_lymph_nodes', 'malaise', 'blurred_and_distorted_vision', 'phlegm', 'throat_irritation', 'redness_of_eyes', 'sinus_pressure', 'runny_nose', 'congestion', 'chest_pain', 'weakness_in_limbs', 'fast_heart_rate', 'pain_during_bowel_movements', 'pain_in_anal_region', 'bloody_stool', 'irritation_in_anus', 'neck_pain', 'dizziness', 'cramps', 'bruising', 'obesity', 'swollen_legs', 'swollen_blood_vessels', 'puffy_face_and_eyes', 'enlarged_thyroid', 'brittle_nails', 'swollen_extremeties', 'excessive_hunger', 'extra_marital_contacts', 'drying_and_tingling_lips', 'slurred_speech', 'knee_pain', 'hip_joint_pain', 'muscle_weakness', 'stiff_neck', 'swelling_joints', 'movement_stiffness', 'spinning_movements', 'loss_of_balance', 'unsteadiness', 'weakness_of_one_body_side', 'loss_of_smell', 'bladder_discomfort', 'continuous_feel_of_urine', 'passage_of_gases', 'internal_itching', 'toxic_look_(typhos)', 'depression', 'irritability', 'muscle_pain', 'altered_sensorium', 'red_spots_over_body', 'belly_pain', 'abnormal_menstruation', 'watering_from_eyes', 'increased_appetite', 'polyuria', 'family_history', 'mucoid_sputum', 'rusty_sputum', 'lack_of_concentration', 'visual_disturbances', 'receiving_blood_transfusion', 'receiving_unsterile_injections', 'coma', 'stomach_bleeding', 'distention_of_abdomen', 'history_of_alcohol_consumption', 'blood_in_sputum', 'prominent_veins_on_calf', 'palpitations', 'painful_walking', 'pus_filled_pimples', 'blackheads', 'scurring', 'skin_peeling', 'silver_like_dusting', 'small_dents_in_nails', 'inflammatory_nails', 'blister', 'red_sore_around_nose', 'yellow_crust_ooze', 'prognosis', 'skin rash','mood swings', 'weight loss', 'fast heart rate', 'excessive hunger', 'muscle weakness', 'abnormal menstruation', 'muscle wasting', 'patches in throat', 'high fever', 'extra marital contacts', 'yellowish skin', 'loss of appetite', 'abdominal pain', 'yellowing of eyes', 'chest pain', 'loss of balance', 'lack of concentration', 'blurred and distorted vision', 'drying and tingling lips', 'slurred speech', 'stiff neck', 'swelling joints', 'painful walking', 'dark urine', 'yellow urine', 'receiving blood transfusion', 'receiving unsterile injections', 'visual disturbances', 'burning micturition', 'bladder discomfort', 'foul smell of urine', 'continuous feel of urine', 'irregular sugar level', 'increased appetite', 'joint pain', 'skin peeling', 'small dents in nails', 'inflammatory nails', 'swelling of stomach', 'distention of abdomen', 'history of alcohol consumption', 'fluid overload', 'pain during bowel movements', 'pain in anal region', 'bloody stool', 'irritation in anus', 'acute liver failure', 'stomach bleeding', 'back pain', 'weakness in limbs', 'neck pain', 'mucoid sputum', 'mild fever', 'muscle pain', 'family history', 'continuous sneezing', 'watering from eyes', 'rusty sputum', 'weight gain', 'puffy face and eyes', 'enlarged thyroid', 'brittle nails', 'swollen extremeties', 'swollen legs', 'prominent veins on calf', 'stomach pain', 'spinning movements', 'sunken eyes', 'silver like dusting', 'swelled lymph nodes', 'blood in sputum', 'swollen blood vessels', 'toxic look (typhos)', 'belly pain', 'throat irritation', 'redness of eyes', 'sinus pressure', 'runny nose', 'loss of smell', 'passage of gases', 'cold hands and feets', 'weakness of one body side', 'altered sensorium', 'nodal skin eruptions', 'red sore around nose', 'yellow crust ooze', 'ulcers on tongue', 'spotting  urination', 'pain behind the eyes', 'red spots over body', 'internal itching']
+# Batches of at least this many rows are scored by the pickled scikit-learn forest,
+# which beats the binary engine's level-by-level walk on large batches
+LARGE_BATCH_ROWS = int(os.environ.get("LARGE_BATCH_ROWS", 128))
 
-print(len(symptoms)) 
-desc=pd.read_csv("symptom_Description.csv")
-prec=pd.read_csv("symptom_precaution.csv") 
+def build_model(path):
+    engine = os.environ.get("INFERENCE_ENGINE", "binary")
+    if INFERENCE_PROCESSES > 0:
+        return InferencePool.from_path(path, processes=INFERENCE_PROCESSES, engine=engine,
+                                       feature_weights=feature_weights)
+    model = load_model(path)
+    # Features are 0/1 symptom flags, so by default the trees are compiled into the
+    # binary inference engine, which folds any severity weights into its splits;
+    # INFERENCE_ENGINE=sklearn keeps the loaded model and weights the features instead
+    if engine == "binary":
+        return compile_forest(model, feature_weights=feature_weights, large_batch_rows=LARGE_BATCH_ROWS)
+    if feature_weights is not None:
+        return WeightedModel(model, feature_weights)
+    return model
+
+# A new model is scored on the empty row and on every single symptom before it is activated
+registry = ModelRegistry(
+    build_model,
+    warmup_rows=indices_to_csr([()] + [(i,) for i in range(len(symptoms))], len(symptoms)),
+    n_classes=len(diseases),
+    watch_interval=MODEL_WATCH_INTERVAL,
+    path=MODEL_PATH,
+)
+# An inference pool belongs to the process that starts it, so with INFERENCE_PROCESSES
+# every worker loads its own on first use (warm_up) and neither the preloading gunicorn
+# master nor the pool processes, which import this module again, start one
+if INFERENCE_PROCESSES == 0:
+    registry.load(MODEL_PATH)
+
+def model_handle():
+    """
+    :return: The ModelHandle this request scores with, held until the request ends
+    """
+    if 'model_handle' not in g:
+        g.model_handle = registry.acquire()
+    return g.model_handle
+
+@app.teardown_request
+def release_model_handle(exc):
+    # A model retired by a reload is closed once no request holds it any more
+    handle = g.pop('model_handle', None)
+    if handle is not None:
+        registry.release(handle)
+
+# Per-worker startup figures, filled in by the hooks in gunicorn.conf.py
+worker_info = {'pid': os.getpid(), 'cold_start_ms': None, 'warmup_ms': None}
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+    request_started()
+
+@app.after_request
+def log_response(response):
+    # One sampled summary line per request; see utils.logs for LOG_SAMPLE_RATES
+    if 'started' in g:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_finished(route, request.method, response.status_code, g.started)
+        if request.url_rule is not None:
+            log_request(logger, route, response.status_code, g.started, **g.get('log_fields', {}))
+    return response
 
 # @app.route('/disease', methods=["GET"]) 
 # def disease(): send_from_directory('../frontend/src/components/diseasePrediction/Disease.jsx', 'index.html')
@@ -25,53 +168,198 @@ prec=pd.read_csv("symptom_precaution.csv")
 @app.route('/predict', methods=['POST'])
 def predict():
     data = request.get_json(force=True)
-    print("Received Data:", data)
-    
+    logger.debug("Received data", extra={'data': data})
+
     if not data:
         return jsonify({'error': 'No symptoms provided'}), 400
 
-    # Create feature vector
-    features = [0] * len(symptoms)
-    for symptom in data:
-        if symptom in symptoms:
-            index = symptoms.index(symptom)
-            features[index] = 1
-        else:
-            print(f"Symptom not found: {symptom}")
+    k = request.args.get('top_k', DEFAULT_TOP_K, type=int)
+    if k < 1:
+        return jsonify({'error': 'top_k must be a positive integer'}), 400
+
+    # Sparse feature row: only the columns of the reported symptoms
+    columns, unknown = build_feature_indices(symptom_index, data)
+    g.log_fields = {'n_symptoms': len(columns), 'unknown': unknown}
+    logger.debug("Feature indices", extra={'columns': columns})
 
-    print("Feature Vector:", features)
+    # Held until the request ends, so a concurrent model swap can neither mix
+    # versions nor close the model this request is scoring with
+    handle = model_handle()
+    cache_key = (columns, k)
+    cached = prediction_cache.get(cache_key, handle.version)
+    if cached is not None:
+        return jsonify(cached)
 
     # Model prediction
     try:
-        proba = model.predict_proba([features])
-        print("Prediction Probabilities:", proba)
+        known = case_index.exact(columns)
+        if known is not None:
+            proba = case_index.scores(handle.model, handle.version)[known][np.newaxis]
+        elif batcher:
+            with timed('model', 'batcher'):
+                proba = batcher.predict(columns)[np.newaxis]
+        else:
+            with timed('model', 'predict_proba'):
+                proba = handle.model.predict_proba(indices_to_csr([columns], len(symptoms)))
+        # Rendering the probability vector is only worth it when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prediction probabilities", extra={'proba': proba.round(4).tolist()})
     except Exception as e:
-        print(f"Model Prediction Error: {str(e)}")
+        logger.exception("Model prediction failed")
         return jsonify({'error': str(e), 'message': 'Prediction failed.'}), 500
 
-    # Process results
-    top5_idx = np.argsort(proba[0])[-5:][::-1]
-    top5_proba = np.sort(proba[0])[-5:][::-1]
-    top5_diseases = [diseases[i] for i in top5_idx]
+    idx, top = top_k(proba[0], k)
+    response = format_predictions(idx, top)
+    prediction_cache.put(cache_key, handle.version, response)
+    return jsonify(response)
 
+@app.route('/predict/similar', methods=['POST'])
+def predict_similar():
+    data = request.get_json(force=True)
+    if not data or not isinstance(data, list):
+        return jsonify({'error': 'No symptoms provided'}), 400
+
+    k = request.args.get('k', 5, type=int)
+    if k < 1:
+        return jsonify({'error': 'k must be a positive integer'}), 400
+
+    columns, unknown = build_feature_indices(symptom_index, data)
+    indices, similarities = case_index.nearest(columns, k)
+    return jsonify({
+        'exact': case_index.exact(columns) is not None,
+        'unknown': unknown,
+        'cases': [{
+            'disease': str(case_index.labels[i]),
+            'similarity': float(similarity),
+            'count': int(case_index.counts[i]),
+            'symptoms': sorted({normalize_symptom(symptoms[c]) for c in case_index.columns[i]}),
+        } for i, similarity in zip(indices, similarities)],
+    })
+
+@app.route('/symptoms/suggest', methods=['GET'])
+def suggest_symptoms():
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+
+    response = jsonify(suggest_index.suggest(query, limit))
+    # Answers only change with the index, so browsers and CDNs may keep them
+    # Hashed, as the raw query may hold characters an ETag cannot carry
+    query_key = hashlib.sha1(normalize_symptom(query).encode()).hexdigest()
+    response.set_etag(f"{suggest_index.version}-{limit}-{query_key}")
+    response.cache_control.public = True
+    response.cache_control.max_age = SUGGEST_MAX_AGE
+    return response.make_conditional(request)
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    data = request.get_json(force=True)
+
+    if not data or not isinstance(data, list) or not all(isinstance(row, list) for row in data):
+        return jsonify({'error': 'Expected a list of symptom lists'}), 400
+    if len(data) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch size exceeds limit of {MAX_BATCH_SIZE}'}), 400
+
+    k = request.args.get('top_k', DEFAULT_TOP_K, type=int)
+    if k < 1:
+        return jsonify({'error': 'top_k must be a positive integer'}), 400
+
+    # One sparse feature matrix and a single model call for the whole batch
+    features, unknown = build_feature_csr(symptom_index, len(symptoms), data)
+
+    try:
+        with timed('model', 'predict_proba_batch'):
+            proba = model_handle().model.predict_proba(features)
+    except Exception as e:
+        logger.exception("Model prediction failed", extra={'rows': len(data)})
+        return jsonify({'error': str(e), 'message': 'Prediction failed.'}), 500
+
+    # Row-wise partial selection over the whole probability matrix
+    idx, top = top_k(proba, k)
+    return jsonify([
+        {'predictions': format_predictions(row_idx, row_top), 'unknown': missing}
+        for row_idx, row_top, missing in zip(idx, top, unknown)
+    ])
+
+@app.route('/admin/batcher', methods=['GET'])
+def batcher_stats():
+    if not batcher:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **batcher.stats()})
+
+@app.route('/admin/model', methods=['GET'])
+def model_status():
+    # ru_maxrss is reported in kilobytes on Linux
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return jsonify({**registry.status(), 'worker': {**worker_info, 'pid': os.getpid(), 'max_rss_mb': max_rss_mb,
+                                                    'dropped_log_records': dropped_records()}})
+
+def resolve_model_path(path):
+    """
+    :param path: Artifact path from a reload request, relative to MODEL_DIR or absolute
+    :return: The resolved path, or None if it lies outside MODEL_DIR
+    """
+    resolved = os.path.realpath(os.path.join(MODEL_DIR, path))
+    if os.path.commonpath([resolved, MODEL_DIR]) != MODEL_DIR:
+        return None
+    return resolved
+
+@app.route('/admin/model/reload', methods=['POST'])
+def model_reload():
+    # Loading a model unpickles it, so this is never left open
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Model reload is disabled, set ADMIN_TOKEN to enable it'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.get_json(silent=True) or {}
+    path = None
+    if data.get('path'):
+        path = resolve_model_path(str(data['path']))
+        if path is None:
+            return jsonify({'error': f'Model path must be inside {MODEL_DIR}'}), 400
+    if not registry.reload(path):
+        return jsonify({'error': 'A model is already loading', **registry.status()}), 409
+    return jsonify({'message': 'Model reload started', **registry.status()}), 202
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+@app.route('/admin/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+def format_predictions(indices, probabilities):
     response = []
-    for i in range(3):
-        disease = top5_diseases[i]
-        probability = top5_proba[i]
-        disp = desc[desc['Disease'] == disease].values[0][1] if disease in desc["Disease"].unique() else "No description available"
-        precautions = []
-        if disease in prec["Disease"].unique():
-            c = np.where(prec['Disease'] == disease)[0][0]
-            for j in range(1, len(prec.iloc[c])):
-                precautions.append(prec.iloc[c, j])
+    for i, probability in zip(indices, probabilities):
+        disease = diseases[i]
+        description, precautions = disease_info[disease]
         response.append({
             'disease': disease,
             'probability': float(probability),
-            'description': disp,
-            'precautions': precautions
+            'description': description,
+            'precautions': list(precautions)
         })
-    return jsonify(response)
+    return response
+
+def warm_up(batch_size=16):
+    """
+    Scores a synthetic single row and batch and renders their responses, so the
+    first real request on a worker does not pay NumPy/model first-call costs.
+    Loads the model first if this process has none yet (INFERENCE_PROCESSES).
+
+    :param batch_size: Rows in the synthetic batch (int)
+    :return: Elapsed time in milliseconds
+    """
+    start = time.perf_counter()
+    rows = [(i,) for i in range(min(batch_size, len(symptoms)))]
+    with app.app_context(), registry.using() as handle:
+        for features in (indices_to_csr(rows[:1], len(symptoms)), indices_to_csr(rows, len(symptoms))):
+            idx, top = top_k(handle.model.predict_proba(features), DEFAULT_TOP_K)
+            jsonify([format_predictions(row_idx, row_top) for row_idx, row_top in zip(idx, top)])
+    return (time.perf_counter() - start) * 1000.0
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))  # Default to 5000 if PORT is not set
+    warm_up()
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+ASGI entry point serving the same /predict contract as the Flask app.
+
+Request parsing and response serialization run on the event loop, while the
+CPU-bound model call runs in a bounded thread pool. Once INFERENCE_QUEUE_SIZE
+model calls are pending, new requests are turned away with 429 instead of
+queueing without limit. The model, symptom index, prediction cache and
+disease metadata are shared with app.py; the model is loaded and warmed up
+on a pool thread before the server accepts requests, so the event loop
+never waits for it.
+
+Run from the models directory:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from app import (DEFAULT_TOP_K, MAX_BATCH_SIZE, format_predictions, prediction_cache, registry,
+                 symptom_index, symptoms, warm_up)
+from utils.metrics import CONTENT_TYPE, render_metrics, request_finished, request_started, timed
+from utils.ranking import top_k
+from utils.symptomIndex import build_feature_csr, build_feature_indices, indices_to_csr
+
+# Threads running model calls; NumPy releases the GIL for most of the tree walk
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", os.cpu_count() or 1))
+
+# Most model calls running or waiting before requests are rejected with 429
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", 4 * INFERENCE_THREADS))
+
+executor = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix='inference')
+pending = 0
+
+
+class QueueFull(Exception):
+    pass
+
+
+def score(model, features):
+    # Timed on the inference thread, so queueing for a thread is not counted
+    with timed('model', 'predict_proba'):
+        return model.predict_proba(features)
+
+
+async def run_inference(model, features):
+    # Only touched from the event loop thread, so a plain counter is enough
+    global pending
+    if pending >= INFERENCE_QUEUE_SIZE:
+        raise QueueFull()
+    pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, score, model, features)
+    finally:
+        pending -= 1
+
+
+def parse_top_k(request):
+    try:
+        k = int(request.query_params.get('top_k', DEFAULT_TOP_K))
+    except ValueError:
+        k = DEFAULT_TOP_K
+    return k if k >= 1 else None
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def busy():
+    return JSONResponse({'error': 'Inference queue is full, retry shortly'}, status_code=429,
+                        headers={'Retry-After': '1'})
+
+
+async def predict(request):
+    data = await read_json(request)
+    if not data:
+        return JSONResponse({'error': 'No symptoms provided'}, status_code=400)
+
+    k = parse_top_k(request)
+    if k is None:
+        return JSONResponse({'error': 'top_k must be a positive integer'}, status_code=400)
+
+    columns, _ = build_feature_indices(symptom_index, data)
+    # Held until the model call is done, so a reload cannot close it meanwhile
+    handle = registry.acquire()
+    try:
+        cache_key = (columns, k)
+        cached = prediction_cache.get(cache_key, handle.version)
+        if cached is not None:
+            return JSONResponse(cached)
+        proba = await run_inference(handle.model, indices_to_csr([columns], len(symptoms)))
+    except QueueFull:
+        return busy()
+    except Exception as e:
+        return JSONResponse({'error': str(e), 'message': 'Prediction failed.'}, status_code=500)
+    finally:
+        registry.release(handle)
+
+    idx, top = top_k(proba[0], k)
+    response = format_predictions(idx, top)
+    prediction_cache.put(cache_key, handle.version, response)
+    return JSONResponse(response)
+
+
+async def predict_batch(request):
+    data = await read_json(request)
+    if not data or not isinstance(data, list) or not all(isinstance(row, list) for row in data):
+        return JSONResponse({'error': 'Expected a list of symptom lists'}, status_code=400)
+    if len(data) > MAX_BATCH_SIZE:
+        return JSONResponse({'error': f'Batch size exceeds limit of {MAX_BATCH_SIZE}'}, status_code=400)
+
+    k = parse_top_k(request)
+    if k is None:
+        return JSONResponse({'error': 'top_k must be a positive integer'}, status_code=400)
+
+    features, unknown = build_feature_csr(symptom_index, len(symptoms), data)
+    handle = registry.acquire()
+    try:
+        proba = await run_inference(handle.model, features)
+    except QueueFull:
+        return busy()
+    except Exception as e:
+        return JSONResponse({'error': str(e), 'message': 'Prediction failed.'}, status_code=500)
+    finally:
+        registry.release(handle)
+
+    idx, top = top_k(proba, k)
+    return JSONResponse([
+        {'predictions': format_predictions(row_idx, row_top), 'unknown': missing}
+        for row_idx, row_top, missing in zip(idx, top, unknown)
+    ])
+
+
+async def inference_stats(request):
+    return JSONResponse({
+        'threads': INFERENCE_THREADS,
+        'queue_size': INFERENCE_QUEUE_SIZE,
+        'pending': pending,
+    })
+
+
+async def metrics(request):
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """
+    Records latency and in-flight count of every HTTP request, labelled with
+    the route pattern that handled it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        request_started()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = scope.get('route')
+            request_finished(route.path if route is not None else 'unmatched', scope['method'], status, started)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Model loading and first calls block, so they run before the first request
+    # instead of inside it, where registry.acquire() would stall the event loop
+    await asyncio.get_running_loop().run_in_executor(executor, warm_up)
+    yield
+
+
+app = Starlette(
+    lifespan=lifespan,
+    routes=[
+        Route('/predict', predict, methods=['POST']),
+        Route('/predict/batch', predict_batch, methods=['POST']),
+        Route('/admin/inference', inference_stats, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+    ],
+    middleware=[Middleware(MetricsMiddleware),
+                Middleware(CORSMiddleware, allow_origins=['*'], allow_credentials=True,
+                           allow_methods=['*'], allow_headers=['*'])],
+)
@@ -0,0 +1,38 @@
+"""
+Gunicorn settings for the prediction service, picked up automatically when
+starting from the models directory:
+
+    gunicorn app:app
+
+With preload (the default) the model and disease metadata are loaded once in
+the master and shared copy-on-write by the forked workers. Every worker then
+scores a synthetic warm-up batch before it accepts traffic and reports how
+long it took from fork to ready. With INFERENCE_PROCESSES set, the master
+loads no model and each worker starts its own inference pool during warm-up.
+"""
+import os
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# Micro-batching coalesces requests in flight at the same time, which a sync worker never has
+if os.environ.get("MICRO_BATCHING", "0") == "1":
+    worker_class = "gthread"
+    threads = int(os.environ.get("GUNICORN_THREADS", 16))
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+
+
+def post_worker_init(worker):
+    # Imported here so the hook picks up the module gunicorn already loaded
+    import app
+
+    warmup_ms = app.warm_up()
+    cold_start_ms = (time.perf_counter() - worker.forked_at) * 1000.0
+    app.worker_info.update(pid=os.getpid(), cold_start_ms=cold_start_ms, warmup_ms=warmup_ms)
+    worker.log.info(f"Worker {os.getpid()} ready in {cold_start_ms:.1f} ms (warm-up {warmup_ms:.1f} ms, "
+                    f"preload {'on' if worker.cfg.preload_app else 'off'})")
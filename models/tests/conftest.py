@@ -0,0 +1,8 @@
+import os
+import sys
+
+MODELS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The service imports its helpers as `utils.*` and reads its CSVs relative to the models directory
+sys.path.insert(0, MODELS_DIR)
+os.chdir(MODELS_DIR)
@@ -0,0 +1,39 @@
+import pytest
+
+import app as service
+
+
+@pytest.fixture
+def client():
+    return service.app.test_client()
+
+
+def test_reload_is_refused_without_admin_token(client, monkeypatch):
+    monkeypatch.setattr(service, 'ADMIN_TOKEN', None)
+    response = client.post('/admin/model/reload', json={})
+    assert response.status_code == 403
+
+
+def test_reload_rejects_wrong_token(client, monkeypatch):
+    monkeypatch.setattr(service, 'ADMIN_TOKEN', 'secret')
+    response = client.post('/admin/model/reload', json={}, headers={'X-Admin-Token': 'guess'})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize('path', ['/etc/passwd', '../backend/app.py', 'ExtraTrees/../../backend/app.py'])
+def test_reload_rejects_path_outside_model_dir(client, monkeypatch, path):
+    monkeypatch.setattr(service, 'ADMIN_TOKEN', 'secret')
+    reloads = []
+    monkeypatch.setattr(service.registry, 'reload', lambda path=None: reloads.append(path) or True)
+    response = client.post('/admin/model/reload', json={'path': path}, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 400
+    assert reloads == []
+
+
+def test_reload_accepts_path_inside_model_dir(client, monkeypatch):
+    monkeypatch.setattr(service, 'ADMIN_TOKEN', 'secret')
+    reloads = []
+    monkeypatch.setattr(service.registry, 'reload', lambda path=None: reloads.append(path) or True)
+    response = client.post('/admin/model/reload', json={'path': 'ExtraTrees'}, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 202
+    assert reloads == [service.resolve_model_path('ExtraTrees')]
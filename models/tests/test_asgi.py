@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+starlette_testclient = pytest.importorskip('starlette.testclient')
+
+import asgi  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    asgi.prediction_cache.clear()
+    with starlette_testclient.TestClient(asgi.app) as client:
+        yield client
+
+
+def test_model_is_warmed_up_off_the_event_loop(monkeypatch):
+    threads = []
+    monkeypatch.setattr(asgi, 'warm_up', lambda: threads.append(threading.current_thread().name))
+
+    with starlette_testclient.TestClient(asgi.app):
+        assert len(threads) == 1
+    assert threads[0].startswith('inference')
+
+
+def test_predict_returns_ranked_diseases(client):
+    response = client.post('/predict?top_k=2', json=['itching', 'skin_rash'])
+
+    assert response.status_code == 200
+    predictions = response.json()
+    assert len(predictions) == 2
+    assert predictions[0]['probability'] >= predictions[1]['probability']
+
+
+def test_predict_batch_answers_every_row(client):
+    response = client.post('/predict/batch', json=[['itching'], ['cough', 'not a symptom']])
+
+    assert response.status_code == 200
+    assert [row['unknown'] for row in response.json()] == [[], ['not a symptom']]
+
+
+@pytest.mark.parametrize('url, payload', [
+    ('/predict', []),
+    ('/predict?top_k=0', ['itching']),
+    ('/predict/batch', ['itching']),
+])
+def test_bad_requests_are_rejected(client, url, payload):
+    assert client.post(url, json=payload).status_code == 400
+
+
+def test_full_queue_turns_requests_away(client, monkeypatch):
+    monkeypatch.setattr(asgi, 'pending', asgi.INFERENCE_QUEUE_SIZE)
+    response = client.post('/predict', json=['itching', 'chills', 'cough'])
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
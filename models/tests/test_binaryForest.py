@@ -0,0 +1,32 @@
+import numpy as np
+from scipy import sparse
+from sklearn.ensemble import ExtraTreesClassifier
+
+from utils.binaryForest import compile_forest
+
+
+class CountingForest:
+    def __init__(self, model):
+        self.model = model
+        self.rows = []
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def predict_proba(self, X):
+        self.rows.append(X.shape[0])
+        return self.model.predict_proba(X)
+
+
+def test_large_batches_are_scored_by_the_source_forest():
+    rng = np.random.default_rng(0)
+    X = (rng.random((300, 20)) < 0.2).astype(np.float32)
+    model = ExtraTreesClassifier(n_estimators=10, random_state=0).fit(X, X[:, 0] + X[:, 3])
+    source = CountingForest(model)
+    engine = compile_forest(source, large_batch_rows=64)
+
+    small, large = sparse.csr_matrix(X[:63]), sparse.csr_matrix(X[:64])
+    np.testing.assert_allclose(engine.predict_proba(small), model.predict_proba(small), atol=1e-6)
+    np.testing.assert_allclose(engine.predict_proba(large), model.predict_proba(large), atol=1e-6)
+    # Only the 64-row batch reached the scikit-learn forest
+    assert source.rows == [64]
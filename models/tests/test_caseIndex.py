@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import app as service
+from utils.caseIndex import CaseIndex
+from utils.loadTest import sample_symptom_sets
+from utils.symptomIndex import build_feature_indices, indices_to_csr
+
+
+@pytest.fixture
+def client():
+    service.prediction_cache.clear()
+    return service.app.test_client()
+
+
+def symptom_names(columns):
+    return [service.symptoms[c] for c in columns]
+
+
+def test_identical_records_collapse_into_one_case():
+    features = indices_to_csr([(0, 70), (0, 70), (0, 70), (1,)], 80)
+    index = CaseIndex(features, ['flu', 'flu', 'cold', 'cold'])
+
+    assert index.columns == [(0, 70), (1,)]
+    assert index.labels.tolist() == ['flu', 'cold']
+    assert index.counts.tolist() == [3, 1]
+    assert index.exact((0, 70)) == 0
+    assert index.exact((0,)) is None
+
+    indices, similarities = index.nearest((0,), k=2)
+    assert indices.tolist() == [0, 1]
+    np.testing.assert_allclose(similarities, [0.5, 0.0])
+
+
+def test_known_case_is_answered_from_the_precomputed_scores(client, monkeypatch):
+    columns = service.case_index.columns[0]
+    expected = client.post('/predict', json=symptom_names(columns)).get_json()
+
+    handle = service.registry.current()
+    rows = []
+    model = handle.model
+
+    class Counting:
+        def predict_proba(self, X):
+            rows.append(X.shape[0])
+            return model.predict_proba(X)
+
+    monkeypatch.setattr(service.registry, '_active', handle._replace(model=Counting(), version='counting'))
+    service.prediction_cache.clear()
+
+    assert client.post('/predict', json=symptom_names(columns)).get_json() == expected
+    # Scored once for every known case, never for the single request row
+    assert rows == [len(service.case_index.columns)]
+
+
+def test_similar_ranks_the_exact_case_first(client):
+    columns = service.case_index.columns[0]
+    response = client.post('/predict/similar?k=3', json=symptom_names(columns) + ['not a symptom'])
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['exact'] is True
+    assert body['unknown'] == ['not a symptom']
+    assert len(body['cases']) == 3
+    assert body['cases'][0]['similarity'] == 1.0
+    assert body['cases'][0]['disease'] == str(service.case_index.labels[0])
+
+
+@pytest.mark.parametrize('url, payload', [
+    ('/predict/similar', {'symptoms': ['itching']}),
+    ('/predict/similar', []),
+    ('/predict/similar?k=0', ['itching']),
+])
+def test_similar_rejects_bad_requests(client, url, payload):
+    assert client.post(url, json=payload).status_code == 400
+
+
+def test_load_test_sets_never_hit_the_case_index():
+    sets = sample_symptom_sets('dataset.csv', 300)
+
+    assert len(sets) == 300
+    assert all(3 <= len(s) <= 6 for s in sets)
+    assert all(service.case_index.exact(build_feature_indices(service.symptom_index, s)[0]) is None for s in sets)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from utils.featurizer import featurize_chunk, featurize_csv
+from utils.symptomIndex import build_feature_csr, build_symptom_index
+from utils.vocabulary import symptoms
+
+INDEX = build_symptom_index(symptoms)
+
+
+def columns_of(features, row):
+    return features[row].indices.tolist()
+
+
+def test_chunk_sets_one_per_symptom_whatever_the_spelling():
+    chunk = pd.DataFrame({
+        'Disease': [' Fungal infection ', 'Allergy'],
+        'Symptom_1': ['itching', ' skin_rash'],
+        'Symptom_2': [' skin rash', 'not a symptom'],
+        'Symptom_3': ['itching', None],
+    })
+    features, labels, unknown = featurize_chunk(chunk, INDEX, len(symptoms))
+
+    assert labels.tolist() == ['Fungal infection', 'Allergy']
+    assert unknown == {'not a symptom': 1}
+    assert set(features.data) == {1}
+    expected = build_feature_csr(INDEX, len(symptoms), [['itching', 'skin_rash'], ['skin_rash']])[0]
+    assert columns_of(features, 0) == sorted(expected[0].indices)
+    assert columns_of(features, 1) == sorted(expected[1].indices)
+
+
+def test_csv_matches_row_by_row_featurization(tmp_path):
+    rows = pd.read_csv('dataset.csv', dtype=str).head(250)
+    path = tmp_path / 'sample.csv'
+    rows.to_csv(path, index=False)
+
+    features, labels, unknown = featurize_csv(str(path), chunksize=64)
+
+    submitted = [[s for s in row[1:] if isinstance(s, str)] for row in rows.itertuples(index=False)]
+    expected, _ = build_feature_csr(INDEX, len(symptoms), submitted)
+    assert features.shape == (250, len(symptoms))
+    assert (features != expected).nnz == 0
+    assert labels.tolist() == rows['Disease'].str.strip().tolist()
+
+
+def test_csv_weights_scale_the_features(tmp_path):
+    path = tmp_path / 'sample.csv'
+    path.write_text('Disease,Symptom_1\nAllergy,itching\n')
+    weights = np.full(len(symptoms), 2.0, dtype=np.float32)
+
+    features, _, _ = featurize_csv(str(path), weights=weights)
+    assert set(features.data) == {2.0}
+
+
+def test_empty_csv_gives_an_empty_matrix(tmp_path):
+    path = tmp_path / 'empty.csv'
+    path.write_text('Disease,Symptom_1\n')
+
+    features, labels, unknown = featurize_csv(str(path))
+    assert features.shape == (0, len(symptoms))
+    assert len(labels) == 0 and not unknown
@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier
+
+from utils.forestArtifact import export_forest, load_forest
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = (rng.random((200, 12)) < 0.3).astype(np.float32)
+    return X, X[:, 0] + 2 * X[:, 1]
+
+
+def test_exported_artifact_matches_source(data, tmp_path):
+    X, y = data
+    model = ExtraTreesClassifier(n_estimators=5, random_state=0).fit(X, y)
+    meta = export_forest(model, str(tmp_path / 'forest'))
+
+    loaded = load_forest(str(tmp_path / 'forest'))
+    assert meta['n_trees'] == 5
+    np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(X), atol=1e-6)
+
+
+def test_reexport_leaves_mapped_artifact_intact(data, tmp_path):
+    X, y = data
+    first = ExtraTreesClassifier(n_estimators=5, random_state=0).fit(X, y)
+    second = ExtraTreesClassifier(n_estimators=3, random_state=1).fit(X, X[:, 2])
+    path = str(tmp_path / 'forest')
+
+    export_forest(first, path)
+    live = load_forest(path)
+    export_forest(second, path)
+
+    np.testing.assert_allclose(live.predict_proba(X), first.predict_proba(X), atol=1e-6)
+    np.testing.assert_allclose(load_forest(path).predict_proba(X), second.predict_proba(X), atol=1e-6)
+    assert os.listdir(tmp_path) == ['forest']
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from utils import loadTest
+from utils.loadTest import benchmark, run, sample_symptom_sets
+
+
+class RecordingClient:
+    def __init__(self):
+        self.calls = []
+        self.cache = []
+
+    def post(self, route, payload):
+        self.calls.append((route, payload))
+
+    def set_cache(self, enabled):
+        self.cache.append(enabled)
+
+
+def test_sampling_is_repeatable_per_seed():
+    assert sample_symptom_sets('dataset.csv', 20, seed=3) == sample_symptom_sets('dataset.csv', 20, seed=3)
+    assert sample_symptom_sets('dataset.csv', 20, seed=3) != sample_symptom_sets('dataset.csv', 20, seed=4)
+
+
+def test_run_reports_latency_and_throughput():
+    client = RecordingClient()
+    report = run(client, '/predict/batch', [[['a']], [['b']], [['c']]], rows_per_call=1, concurrency=2)
+
+    assert report['calls'] == 3
+    assert report['p50_ms'] <= report['p95_ms'] <= report['p99_ms']
+    assert report['rows_per_sec'] == pytest.approx(report['calls_per_sec'])
+    assert sorted(payload for _, payload in client.calls) == [[['a']], [['b']], [['c']]]
+
+
+def test_benchmark_runs_each_mode_with_its_cache_setting():
+    client = RecordingClient()
+    sets = [[str(i)] for i in range(40)]
+    results = benchmark(client, sets, ['single', 'batch', 'cached'], batch_size=8, concurrency=1, warmup=4)
+
+    assert results['single']['calls'] == 40
+    assert results['batch']['calls'] == 5
+    assert results['batch']['rows_per_call'] == 8
+    assert results['cached']['calls'] == 40
+    assert client.cache == [False, False, True]
+    assert {route for route, _ in client.calls} == {'/predict', '/predict/batch'}
+
+
+def test_report_is_printed_and_written(tmp_path, capsys, monkeypatch):
+    monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+    output = tmp_path / 'bench.json'
+    loadTest.main(['--requests', '30', '--modes', 'single,batch', '--batch-size', '10', '--output', str(output)])
+
+    report = json.loads(output.read_text())
+    assert json.loads(capsys.readouterr().out) == report
+    assert report['target'] == 'in-process'
+    assert set(report['results']) == {'single', 'batch'}
+    assert report['results']['batch']['calls'] == 3
+
+
+def test_unknown_modes_are_refused():
+    with pytest.raises(SystemExit):
+        loadTest.main(['--modes', 'single,burst'])
@@ -0,0 +1,34 @@
+import json
+import logging
+import queue
+import sys
+
+from utils.logs import DroppingQueueHandler, JsonFormatter
+
+
+def test_queued_record_is_rendered_without_args_or_exc_info():
+    handler = DroppingQueueHandler(queue.Queue())
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        record = logging.LogRecord('t', logging.ERROR, __file__, 1, 'failed for %s', ('alice',), sys.exc_info())
+    record.route = '/predict'
+    handler.handle(record)
+
+    queued = handler.queue.get_nowait()
+    assert queued.msg == 'failed for alice'
+    assert queued.args is None and queued.exc_info is None
+    # The caller's record is left as it was
+    assert record.args == ('alice',) and record.exc_info is not None
+
+    line = json.loads(JsonFormatter().format(queued))
+    assert line['msg'] == 'failed for alice'
+    assert line['route'] == '/predict'
+    assert 'ZeroDivisionError' in line['exc']
+
+
+def test_full_queue_drops_records():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    for _ in range(3):
+        handler.handle(logging.LogRecord('t', logging.INFO, __file__, 1, 'x', (), None))
+    assert handler.dropped == 2
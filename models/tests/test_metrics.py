@@ -0,0 +1,24 @@
+import threading
+
+from utils.metrics import Histogram
+
+
+def test_histogram_sums_shards_of_finished_threads():
+    latency = Histogram('test_latency_seconds', 'Test latency', ('route',), buckets=(0.01, 0.1))
+
+    def record():
+        for value in (0.005, 0.05, 1.0):
+            latency.observe(value, '/predict')
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latency.observe(0.005, '/predict')
+
+    lines = latency.render()
+    assert 'test_latency_seconds_bucket{route="/predict",le="0.01"} 5' in lines
+    assert 'test_latency_seconds_bucket{route="/predict",le="0.1"} 9' in lines
+    assert 'test_latency_seconds_bucket{route="/predict",le="+Inf"} 13' in lines
+    assert 'test_latency_seconds_count{route="/predict"} 13' in lines
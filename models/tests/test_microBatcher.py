@@ -0,0 +1,32 @@
+import threading
+import time
+
+import numpy as np
+
+from utils.microBatcher import MicroBatcher
+
+
+def test_lone_request_skips_the_window():
+    batcher = MicroBatcher(lambda X: X, max_wait_ms=500)
+    started = time.perf_counter()
+    batcher.predict(np.ones(3), timeout=5)
+    assert time.perf_counter() - started < 0.25
+
+
+def test_requests_queued_during_a_batch_are_coalesced():
+    release = threading.Event()
+
+    def predict(X):
+        release.wait(5)
+        return X
+
+    batcher = MicroBatcher(predict, max_wait_ms=50)
+    first = batcher.submit(np.ones(3))
+    time.sleep(0.05)
+    # Queued while the first row is being scored
+    rest = [batcher.submit(np.full(3, i)) for i in range(4)]
+    release.set()
+
+    first.result(5)
+    assert [future.result(5)[0] for future in rest] == [0, 1, 2, 3]
+    assert batcher.stats()['batch_size_histogram'] == {1: 1, 4: 1}
@@ -0,0 +1,86 @@
+import time
+
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.ensemble import ExtraTreesClassifier
+
+from utils.forestArtifact import export_forest
+from utils.modelRegistry import ModelRegistry
+from utils.processPool import InferencePool
+
+N_FEATURES = 12
+
+
+class Model:
+    def __init__(self):
+        self.closed = False
+
+    def predict_proba(self, X):
+        if self.closed:
+            raise RuntimeError("closed")
+        return np.full((X.shape[0], 2), 0.5)
+
+    def close(self):
+        self.closed = True
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def make_registry(loader, path):
+    registry = ModelRegistry(loader, warmup_rows=sparse.csr_matrix((1, N_FEATURES)), n_classes=2)
+    registry.load(path)
+    return registry
+
+
+def test_retired_model_is_closed_after_last_user_releases(tmp_path):
+    path = tmp_path / 'model.pkl'
+    path.write_bytes(b'')
+    registry = make_registry(lambda p: Model(), str(path))
+
+    with registry.using() as old:
+        registry.load(str(path))
+        assert registry.current() is not old
+        # Still in flight: the retired model keeps serving this request
+        assert not old.model.closed
+        old.model.predict_proba(np.zeros((1, N_FEATURES)))
+    assert wait_for(lambda: old.model.closed)
+    assert not registry.current().model.closed
+
+
+def test_unused_retired_model_is_closed_at_once(tmp_path):
+    path = tmp_path / 'model.pkl'
+    path.write_bytes(b'')
+    registry = make_registry(lambda p: Model(), str(path))
+    old = registry.current()
+    registry.load(str(path))
+    assert old.model.closed
+
+
+@pytest.fixture(scope='module')
+def artifact(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    X = (rng.random((200, N_FEATURES)) < 0.3).astype(np.float32)
+    model = ExtraTreesClassifier(n_estimators=5, random_state=0).fit(X, X[:, 0] > 0)
+    path = str(tmp_path_factory.mktemp('artifact') / 'forest')
+    export_forest(model, path)
+    return path, model, X[:4]
+
+
+def test_reload_while_pool_prediction_is_in_flight(artifact):
+    path, model, X = artifact
+    registry = make_registry(lambda p: InferencePool(p, processes=1), path)
+
+    with registry.using() as old:
+        reloaded = registry.reload()
+        assert reloaded
+        assert wait_for(lambda: registry.current() is not old)
+        np.testing.assert_allclose(old.model.predict_proba(X), model.predict_proba(X), atol=1e-6)
+    assert wait_for(lambda: old.model._closed)
+    np.testing.assert_allclose(registry.current().model.predict_proba(X), model.predict_proba(X), atol=1e-6)
+    registry.current().model.close()
@@ -0,0 +1,51 @@
+import pytest
+
+import app as service
+
+
+@pytest.fixture
+def client():
+    service.prediction_cache.clear()
+    return service.app.test_client()
+
+
+def test_batch_rows_match_single_predictions(client):
+    rows = [['itching', 'skin_rash'], ['cough', 'high fever', 'chest_pain'], ['headache']]
+    response = client.post('/predict/batch?top_k=2', json=rows)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body) == len(rows)
+    for row, answer in zip(rows, body):
+        single = client.post('/predict?top_k=2', json=row).get_json()
+        assert [p['disease'] for p in answer['predictions']] == [p['disease'] for p in single]
+        assert [p['probability'] for p in answer['predictions']] == pytest.approx(
+            [p['probability'] for p in single])
+        assert answer['unknown'] == []
+
+
+def test_batch_reports_unknown_symptoms_per_row(client):
+    response = client.post('/predict/batch', json=[['itching', 'not a symptom'], []])
+
+    assert response.status_code == 200
+    assert [row['unknown'] for row in response.get_json()] == [['not a symptom'], []]
+
+
+@pytest.mark.parametrize('payload', [[], {'rows': [['itching']]}, ['itching'], [['itching'], 'cough']])
+def test_batch_rejects_anything_but_a_list_of_lists(client, payload):
+    response = client.post('/predict/batch', json=payload)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Expected a list of symptom lists'}
+
+
+def test_batch_size_is_limited(client, monkeypatch):
+    monkeypatch.setattr(service, 'MAX_BATCH_SIZE', 2)
+    response = client.post('/predict/batch', json=[['itching']] * 3)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Batch size exceeds limit of 2'}
+
+
+def test_batch_rejects_non_positive_top_k(client):
+    assert client.post('/predict/batch?top_k=0', json=[['itching']]).status_code == 400
@@ -0,0 +1,71 @@
+import pytest
+
+import app as service
+from utils import predictionCache
+from utils.predictionCache import PredictionCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_size=2)
+    cache.get('a', 'v1')
+    cache.put('a', 'v1', 1)
+    cache.put('b', 'v1', 2)
+    cache.get('a', 'v1')
+    cache.put('c', 'v1', 3)
+
+    assert cache.get('b', 'v1') is None
+    assert cache.get('a', 'v1') == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(predictionCache.time, 'monotonic', lambda: now[0])
+    cache = PredictionCache(ttl_seconds=10)
+    cache.get('a', 'v1')
+    cache.put('a', 'v1', 1)
+
+    now[0] += 5
+    assert cache.get('a', 'v1') == 1
+    now[0] += 6
+    assert cache.get('a', 'v1') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_a_new_model_version_invalidates_every_entry():
+    cache = PredictionCache()
+    cache.get('a', 'v1')
+    cache.put('a', 'v1', 1)
+
+    assert cache.get('a', 'v2') is None
+    # A response computed by the old model arriving late is not stored
+    cache.put('a', 'v1', 1)
+    assert cache.get('a', 'v2') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_a_zero_size_cache_stores_nothing():
+    cache = PredictionCache(max_size=0)
+    cache.get('a', 'v1')
+    cache.put('a', 'v1', 1)
+    assert cache.get('a', 'v1') is None
+
+
+@pytest.fixture
+def client():
+    service.prediction_cache.clear()
+    return service.app.test_client()
+
+
+def test_same_symptom_set_in_any_spelling_is_served_from_cache(client):
+    first = client.post('/predict', json=['skin_rash', 'Itching', 'chills'])
+    hits = client.get('/admin/cache').get_json()['hits']
+    second = client.post('/predict', json=['chills', 'itching', 'skin rash'])
+
+    assert second.get_json() == first.get_json()
+    assert client.get('/admin/cache').get_json()['hits'] == hits + 1
+
+
+def test_top_k_is_part_of_the_key(client):
+    client.post('/predict?top_k=2', json=['chills', 'cough'])
+    assert len(client.post('/predict?top_k=4', json=['chills', 'cough']).get_json()) == 4
@@ -0,0 +1,85 @@
+import os
+import pickle
+import runpy
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier
+
+from conftest import MODELS_DIR
+from utils.forestArtifact import export_forest
+from utils.processPool import InferencePool
+
+
+@pytest.fixture(scope='module')
+def forest():
+    rng = np.random.default_rng(0)
+    X = (rng.random((200, 12)) < 0.3).astype(np.float32)
+    y = X[:, 0] + 2 * X[:, 1]
+    return ExtraTreesClassifier(n_estimators=5, random_state=0).fit(X, y), X[:8]
+
+
+# Run in a fresh interpreter: a process that has already used a pool (as other
+# tests in this session do) owns a forkserver its forked children cannot use
+FORKED_CHILD = """
+import multiprocessing, sys
+import numpy as np
+from utils.processPool import InferencePool
+
+def score(pool, X, results):
+    try:
+        results.put(pool.predict_proba(X))
+    finally:
+        pool.close()
+
+if __name__ == '__main__':
+    X = np.load(sys.argv[2])
+    # Built (but not called) in the parent, as the preloading gunicorn master does
+    pool = InferencePool(sys.argv[1], processes=2)
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    child = ctx.Process(target=score, args=(pool, X, results))
+    child.start()
+    np.save(sys.argv[3], results.get(timeout=60))
+    child.join(timeout=60)
+    sys.exit(child.exitcode or (pool._executor is not None))
+"""
+
+
+def test_pool_built_before_fork_serves_forked_child(forest, tmp_path):
+    model, X = forest
+    export_forest(model, str(tmp_path / 'forest'))
+    np.save(tmp_path / 'X.npy', X)
+    script = tmp_path / 'forked_child.py'
+    script.write_text(FORKED_CHILD)
+
+    result = subprocess.run([sys.executable, str(script), str(tmp_path / 'forest'), str(tmp_path / 'X.npy'),
+                             str(tmp_path / 'proba.npy')], cwd=MODELS_DIR, env={**os.environ, 'PYTHONPATH': MODELS_DIR},
+                            capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    np.testing.assert_allclose(np.load(tmp_path / 'proba.npy'), model.predict_proba(X), atol=1e-6)
+
+
+def test_close_removes_exported_artifact(forest, tmp_path):
+    model, X = forest
+    path = tmp_path / 'model.pkl'
+    path.write_bytes(pickle.dumps(model))
+
+    pool = InferencePool.from_path(str(path), processes=1)
+    artifact = pool.path
+    np.testing.assert_allclose(pool.predict_proba(X), model.predict_proba(X), atol=1e-6)
+    pool.close()
+
+    assert not os.path.exists(artifact)
+    with pytest.raises(RuntimeError):
+        pool.predict_proba(X)
+
+
+def test_app_reimported_by_pool_processes_loads_no_model(monkeypatch):
+    monkeypatch.setenv('INFERENCE_PROCESSES', '1')
+    # How forkserver and spawn children import the script that started them
+    namespace = runpy.run_path('app.py', run_name='__mp_main__')
+    assert namespace['registry']._active is None
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import app as service
+from utils.ranking import top_k
+
+
+def test_top_k_matches_a_full_sort():
+    proba = np.random.default_rng(0).random((5, 41))
+    idx, top = top_k(proba, 4)
+
+    np.testing.assert_array_equal(idx, np.argsort(-proba, axis=1)[:, :4])
+    np.testing.assert_array_equal(top, np.take_along_axis(proba, idx, axis=1))
+
+
+def test_top_k_is_clamped_to_the_number_of_classes():
+    idx, top = top_k(np.array([0.2, 0.5, 0.3]), 10)
+
+    assert idx.tolist() == [1, 2, 0]
+    assert top.tolist() == [0.5, 0.3, 0.2]
+
+
+def test_ties_keep_class_order():
+    idx, _ = top_k(np.array([0.25, 0.25, 0.25, 0.25]), 4)
+    assert idx.tolist() == [0, 1, 2, 3]
+
+
+@pytest.fixture
+def client():
+    service.prediction_cache.clear()
+    return service.app.test_client()
+
+
+def test_predict_returns_top_k_diseases_best_first(client):
+    response = client.post('/predict?top_k=5', json=['itching', 'skin_rash', 'nodal_skin_eruptions'])
+
+    assert response.status_code == 200
+    predictions = response.get_json()
+    assert len(predictions) == 5
+    probabilities = [p['probability'] for p in predictions]
+    assert probabilities == sorted(probabilities, reverse=True)
+    assert set(predictions[0]) == {'disease', 'probability', 'description', 'precautions'}
+
+
+def test_predict_defaults_to_the_configured_top_k(client):
+    predictions = client.post('/predict', json=['cough', 'high fever']).get_json()
+    assert len(predictions) == service.DEFAULT_TOP_K
+
+
+@pytest.mark.parametrize('k', ['0', '-1'])
+def test_predict_rejects_non_positive_top_k(client, k):
+    response = client.post(f'/predict?top_k={k}', json=['cough'])
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'top_k must be a positive integer'}
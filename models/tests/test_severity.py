@@ -0,0 +1,41 @@
+import numpy as np
+from scipy import sparse
+from sklearn.ensemble import ExtraTreesClassifier
+
+from utils.binaryForest import compile_forest
+from utils.severity import WeightedModel, apply_feature_weights, load_severity_weights
+
+
+def test_weights_follow_the_feature_columns(tmp_path):
+    path = tmp_path / 'severity.csv'
+    path.write_text('Symptom,weight\nitching,1\nskin_rash,3\nskin rash,5\ncough,4\n')
+
+    weights = load_severity_weights(str(path), ['cough', 'skin rash', 'skin_rash', 'headache'], default=2.0)
+    # skin rash is listed twice under two spellings; the first entry wins for both columns
+    assert weights.tolist() == [4.0, 3.0, 3.0, 2.0]
+    assert weights.dtype == np.float32
+
+
+def test_apply_scales_sparse_and_dense_matrices():
+    weights = np.array([1.0, 2.0, 3.0], dtype=np.float32)
+    X = sparse.csr_matrix(np.array([[1, 0, 1], [0, 1, 0]], dtype=np.float32))
+
+    weighted = apply_feature_weights(X, weights)
+    assert sparse.isspmatrix_csr(weighted)
+    assert weighted.toarray().tolist() == [[1, 0, 3], [0, 2, 0]]
+    # The input matrix is left untouched
+    assert X.toarray().tolist() == [[1, 0, 1], [0, 1, 0]]
+    assert apply_feature_weights(X.toarray(), weights).tolist() == [[1, 0, 3], [0, 2, 0]]
+    assert apply_feature_weights(X, None) is X
+
+
+def test_weighted_model_and_compiled_engine_agree():
+    rng = np.random.default_rng(0)
+    X = (rng.random((200, 12)) < 0.3).astype(np.float32)
+    weights = rng.integers(1, 7, 12).astype(np.float32)
+    model = ExtraTreesClassifier(n_estimators=8, random_state=0).fit(X * weights, X[:, 0] + X[:, 5])
+
+    rows = sparse.csr_matrix(X[:50])
+    expected = model.predict_proba(X[:50] * weights)
+    np.testing.assert_allclose(WeightedModel(model, weights).predict_proba(rows), expected, atol=1e-6)
+    np.testing.assert_allclose(compile_forest(model, feature_weights=weights).predict_proba(rows), expected, atol=1e-6)
@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+from conftest import MODELS_DIR
+
+BACKEND_UTILS = os.path.join(os.path.dirname(MODELS_DIR), 'backend', 'utils')
+
+# Modules both services ship a copy of, see their docstrings
+SHARED = ['logs.py', 'metrics.py']
+
+
+@pytest.mark.parametrize('name', SHARED)
+def test_backend_copy_matches_models(name):
+    with open(os.path.join(MODELS_DIR, 'utils', name)) as models, open(os.path.join(BACKEND_UTILS, name)) as backend:
+        assert models.read() == backend.read(), f"models/utils/{name} and backend/utils/{name} differ"
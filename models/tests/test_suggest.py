@@ -0,0 +1,32 @@
+import pytest
+
+import app as service
+from utils.suggest import SuggestIndex
+
+
+@pytest.fixture
+def client():
+    return service.app.test_client()
+
+
+def test_prefix_matches_later_words_after_whole_names():
+    index = SuggestIndex(['skin_rash', 'rashes', 'nodal skin eruptions'])
+    assert [s['symptom'] for s in index.suggest('ras')] == ['rashes', 'skin rash']
+    assert index.suggest('') == []
+
+
+def test_suggest_response_is_cacheable(client):
+    response = client.get('/symptoms/suggest?q=itch&limit=3')
+    assert response.status_code == 200
+    assert response.json and all(set(s) == {'symptom', 'match'} for s in response.json)
+    assert len(response.json) <= 3
+    assert response.cache_control.public
+
+    again = client.get('/symptoms/suggest?q=itch&limit=3', headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_query_with_quotes_is_answered(client):
+    response = client.get('/symptoms/suggest?q=a%22b')
+    assert response.status_code == 200
+    assert response.json == []
@@ -0,0 +1,247 @@
+"""
+Inference engine for tree ensembles over 0/1 symptom vectors.
+
+Every feature the server builds is a symptom flag, so a split "x <= t" with
+0 < t < 1 simply asks whether the symptom is present. The engine compiles the
+flat arrays of utils.forestArtifact into a (node, bit) -> child table and walks
+all trees of a batch at once, one level per iteration, with plain array
+indexing. Leaves are appended as self-looping nodes so finished walks can be
+dropped from the active set without special casing.
+
+Trees that split on at most max_table_bits distinct features are additionally
+precompiled into a lookup table from the bitmask of those features to a leaf.
+
+The level-by-level walk wins on the small batches /predict sends, but from a
+hundred or so rows on scikit-learn's compiled per-tree walk is faster. When
+compiled from a scikit-learn forest, the engine keeps it and hands batches of
+large_batch_rows or more to its predict_proba.
+
+Usage (from the models directory), checks parity and prints a benchmark:
+    python -m utils.binaryForest ExtraTrees
+"""
+import pickle
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+from utils.forestArtifact import FlatForest, flatten_forest
+from utils.severity import apply_feature_weights
+
+
+class BinaryForest:
+    """
+    Tree ensemble specialised for binary feature matrices.
+
+    Exposes the subset of the scikit-learn classifier interface the server
+    uses (predict_proba, classes_, n_features_in_). Rows that are not 0/1 are
+    scored by the generic threshold walk of the underlying FlatForest, large
+    batches by the source scikit-learn forest if there is one.
+    """
+
+    def __init__(self, flat, max_table_bits=12, feature_weights=None, source=None, large_batch_rows=128):
+        """
+        :param flat: FlatForest to compile
+        :param max_table_bits: Largest per-tree feature count compiled into a lookup table (int)
+        :param feature_weights: Per-column weights the forest was trained with, see utils.severity;
+                                input stays 0/1 and the weights are folded into the splits
+        :param source: scikit-learn forest flat was exported from, used for large batches (optional)
+        :param large_batch_rows: Smallest batch handed to source (int)
+        """
+        self.flat = flat
+        self.feature_weights = feature_weights
+        self.source = source
+        self.large_batch_rows = large_batch_rows
+        self.classes_ = flat.classes_
+        self.n_features_in_ = flat.n_features_in_
+        self.n_classes = flat.n_classes
+        self.leaf_value = flat.leaf_value
+
+        n_nodes = len(flat.feature)
+        n_leaves = len(flat.leaf_value)
+        self.n_nodes = n_nodes
+
+        # Negative child ids (~leaf) become the appended leaf node n_nodes + leaf
+        def node_id(children):
+            children = np.asarray(children, dtype=np.int64)
+            return np.where(children < 0, n_nodes + ~children, children)
+
+        threshold = np.asarray(flat.threshold)
+        left = node_id(flat.left)
+        right = node_id(flat.right)
+        # A present symptom is worth its weight (1 unless weighted), so a split
+        # threshold outside [0, weight) sends both bit values the same way
+        weight = 1.0 if feature_weights is None else np.asarray(feature_weights)[flat.feature]
+        on_zero = np.where(threshold < 0, right, left)
+        on_one = np.where(threshold >= weight, left, right)
+
+        leaf_nodes = n_nodes + np.arange(n_leaves)
+        # Interleaved so that the child of node n for bit b sits at 2 * n + b
+        self.children = np.stack([
+            np.concatenate([on_zero, leaf_nodes]),
+            np.concatenate([on_one, leaf_nodes]),
+        ], axis=1).astype(np.intp).ravel()
+        self.feature = np.concatenate([flat.feature, np.zeros(n_leaves, dtype=np.int32)]).astype(np.intp)
+        self.roots = node_id(flat.roots).astype(np.intp)
+
+        self.tables = {}
+        for t in range(len(self.roots)):
+            table = self._compile_table(t, max_table_bits)
+            if table is not None:
+                self.tables[t] = table
+        self.walked = np.array([t for t in range(len(self.roots)) if t not in self.tables], dtype=np.intp)
+
+    def _tree_nodes(self, t):
+        nodes, frontier = [], [int(self.roots[t])]
+        while frontier:
+            internal = [n for n in frontier if n < self.n_nodes]
+            nodes.extend(internal)
+            frontier = self.children.reshape(-1, 2)[internal].ravel().tolist() if internal else []
+        return nodes
+
+    def _compile_table(self, t, max_table_bits):
+        used = np.unique(self.feature[self._tree_nodes(t)])
+        if len(used) > max_table_bits:
+            return None
+        # Enumerate every combination of the tree's features and walk it once
+        codes = np.arange(1 << len(used))
+        X = np.zeros((len(codes), self.n_features_in_), dtype=np.uint8)
+        X[:, used] = (codes[:, None] >> np.arange(len(used))) & 1
+        leaves = self._walk(X, np.array([t], dtype=np.intp))[:, 0]
+        weights = (1 << np.arange(len(used))).astype(np.int64)
+        return used, weights, leaves
+
+    def _walk(self, X, trees):
+        """
+        Walks the given trees for every row, all (row, tree) pairs per level.
+
+        :param X: (N, n_features) uint8 matrix of 0/1 flags
+        :param trees: Indices of the trees to walk
+        :return: (N, len(trees)) array of leaf ids
+        """
+        n_rows = X.shape[0]
+        node = np.broadcast_to(self.roots[trees], (n_rows, len(trees))).ravel().copy()
+        offset = np.repeat(np.arange(n_rows, dtype=np.intp) * self.n_features_in_, len(trees))
+        pos = np.arange(node.size)
+        X = X.ravel()
+        leaves = np.empty(node.size, dtype=np.intp)
+
+        level = 0
+        while pos.size:
+            node = self.children[2 * node + X[offset + self.feature[node]]]
+            level += 1
+            # Compacting costs a pass over the active set, so only do it once
+            # a sizeable share of the walks has reached a leaf
+            if level % 4 == 0:
+                done = node >= self.n_nodes
+                n_done = np.count_nonzero(done)
+                if 4 * n_done >= node.size:
+                    leaves[pos[done]] = node[done]
+                    keep = ~done
+                    node, offset, pos = node[keep], offset[keep], pos[keep]
+        return (leaves - self.n_nodes).reshape(n_rows, len(trees))
+
+    def apply(self, X):
+        """
+        Finds the leaf reached by every row in every tree.
+
+        :param X: (N, n_features) 0/1 feature matrix
+        :return: (N, n_trees) array of leaf ids
+        """
+        X = np.ascontiguousarray(X, dtype=np.uint8)
+        leaves = np.empty((X.shape[0], len(self.roots)), dtype=np.intp)
+        for t, (used, weights, table) in self.tables.items():
+            leaves[:, t] = table[X[:, used] @ weights]
+        if len(self.walked):
+            leaves[:, self.walked] = self._walk(X, self.walked)
+        return leaves
+
+    def predict_proba(self, X):
+        """
+        Averages the leaf class distributions over all trees.
+
+        :param X: (N, n_features) feature matrix, dense or scipy.sparse
+        :return: (N, n_classes) array of class probabilities
+        """
+        if self.source is not None and X.shape[0] >= self.large_batch_rows:
+            return self.source.predict_proba(apply_feature_weights(X, self.feature_weights))
+        if sparse.issparse(X):
+            X = sparse.csr_matrix(X)
+            if not (X.data == 1).all():
+                return self.flat.predict_proba(apply_feature_weights(X, self.feature_weights))
+            # Scatter the stored ones into a byte matrix; cost follows nnz
+            rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+            dense = np.zeros(X.shape, dtype=np.uint8)
+            dense[rows, X.indices] = 1
+            leaves = self.apply(dense)
+        else:
+            X = np.asarray(X)
+            if not ((X == 0) | (X == 1)).all():
+                return self.flat.predict_proba(apply_feature_weights(X, self.feature_weights))
+            leaves = self.apply(X)
+        return self.leaf_value[leaves].mean(axis=1, dtype=np.float64)
+
+
+def compile_forest(model, max_table_bits=12, feature_weights=None, large_batch_rows=128):
+    """
+    Builds the binary engine from a FlatForest or a fitted scikit-learn forest.
+
+    :param model: FlatForest, or forest classifier exposing estimators_
+    :param max_table_bits: Largest per-tree feature count compiled into a lookup table (int)
+    :param feature_weights: Per-column weights the forest was trained with (optional)
+    :param large_batch_rows: Smallest batch scored by a scikit-learn model instead of the engine (int)
+    :return: BinaryForest
+    """
+    source = None
+    if not isinstance(model, FlatForest):
+        source, model = model, FlatForest(*flatten_forest(model))
+    return BinaryForest(model, max_table_bits=max_table_bits, feature_weights=feature_weights,
+                        source=source, large_batch_rows=large_batch_rows)
+
+
+def benchmark(predict_fn, X, repeat=5):
+    """
+    Best-of-repeat timing of predict_fn on X.
+
+    :return: (per-row latency in microseconds, rows per second)
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict_fn(X)
+        best = min(best, time.perf_counter() - start)
+    return best / len(X) * 1e6, len(X) / best
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Usage: python -m utils.binaryForest <pickled model>")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'rb') as f:
+        source = pickle.load(f)
+
+    start = time.perf_counter()
+    engine = compile_forest(source)
+    print(f"Compiled {len(engine.roots)} trees ({len(engine.tables)} as lookup tables) "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Parity on sparse random symptom sets, matching real requests (a handful of flags)
+    rng = np.random.default_rng(0)
+    X = (rng.random((2000, source.n_features_in_)) < 0.03).astype(np.float32)
+    # The walk alone, without handing large batches back to scikit-learn
+    walk = BinaryForest(engine.flat, feature_weights=engine.feature_weights)
+    error = np.abs(walk.predict_proba(X) - source.predict_proba(X)).max()
+    print(f"Max abs difference vs {type(source).__name__}.predict_proba: {error:.2e}")
+    if error > 1e-6:
+        sys.exit("Parity check failed")
+
+    print(f"{'batch':>6} {'sklearn us/row':>15} {'engine us/row':>14} {'walk us/row':>12} "
+          f"{'sklearn rows/s':>15} {'engine rows/s':>14}")
+    for size in (1, 16, 64, 128, 256, 2000):
+        sk_latency, sk_rate = benchmark(source.predict_proba, X[:size])
+        en_latency, en_rate = benchmark(engine.predict_proba, X[:size])
+        walk_latency, _ = benchmark(walk.predict_proba, X[:size])
+        print(f"{size:>6} {sk_latency:>15.1f} {en_latency:>14.1f} {walk_latency:>12.1f} "
+              f"{sk_rate:>15.0f} {en_rate:>14.0f}")
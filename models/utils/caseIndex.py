@@ -0,0 +1,164 @@
+"""
+Index of the known cases in dataset.csv as bit-packed symptom signatures.
+
+Every distinct row of the training data is packed into a few uint64 words
+(one bit per feature column). Identical rows collapse into one case with a
+count per disease. Exact matches are found through a hash of the packed
+words, near matches by a popcount-based Jaccard similarity over all cases.
+
+Usage (from the models directory), prints index size and lookup latency:
+    python -m utils.caseIndex
+"""
+import threading
+import time
+
+import numpy as np
+
+from utils.featurizer import featurize_csv
+from utils.symptomIndex import indices_to_csr
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        counts = _BYTE_COUNTS[np.ascontiguousarray(words).view(np.uint8)]
+        return counts.reshape(*words.shape[:-1], -1).sum(axis=-1, dtype=np.int64)
+
+
+def pack_signatures(features):
+    """
+    Packs a 0/1 feature matrix into uint64 signatures.
+
+    :param features: (N, n_features) CSR matrix
+    :return: (N, ceil(n_features / 64)) uint64 array
+    """
+    features = features.tocsr()
+    n_words = (features.shape[1] + 63) // 64
+    signatures = np.zeros((features.shape[0], n_words), dtype=np.uint64)
+    rows = np.repeat(np.arange(features.shape[0]), np.diff(features.indptr))
+    cols = features.indices.astype(np.uint64)
+    np.bitwise_or.at(signatures, (rows, cols // 64), np.left_shift(np.uint64(1), cols % 64))
+    return signatures
+
+
+def pack_columns(columns, n_words):
+    """
+    Packs one sorted column index tuple into a signature.
+
+    :return: (n_words,) uint64 array
+    """
+    # Plain ints are far cheaper to OR together than NumPy scalars
+    words = [0] * n_words
+    for c in columns:
+        words[c >> 6] |= 1 << (c & 63)
+    return np.array(words, dtype=np.uint64)
+
+
+class CaseIndex:
+    """
+    Distinct known cases with exact and nearest-neighbour lookup.
+
+    Attributes:
+        signatures: (n_cases, n_words) uint64 packed symptom sets
+        columns: Sorted feature column tuple of every case
+        labels: Most frequent disease of every case
+        counts: Number of dataset rows behind every case
+        agreement: Share of those rows labelled with the majority disease
+    """
+
+    def __init__(self, features, labels):
+        """
+        :param features: (N, n_features) CSR matrix of 0/1 flags, one row per record
+        :param labels: Disease of every record
+        """
+        labels = np.asarray(labels)
+        packed = pack_signatures(features)
+        self.n_words = packed.shape[1]
+        self.signatures, inverse = np.unique(packed, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+
+        # Majority disease and row count per distinct case
+        classes, label_ids = np.unique(labels, return_inverse=True)
+        tally = np.zeros((len(self.signatures), len(classes)), dtype=np.int64)
+        np.add.at(tally, (inverse, label_ids), 1)
+        self.labels = classes[tally.argmax(axis=1)]
+        self.counts = tally.sum(axis=1)
+        self.agreement = tally.max(axis=1) / self.counts
+
+        self.sizes = _popcount(self.signatures)
+        self.columns = [tuple(np.flatnonzero(np.unpackbits(s.view(np.uint8), bitorder='little')).tolist())
+                        for s in self.signatures]
+        self._exact = {s.tobytes(): i for i, s in enumerate(self.signatures)}
+        self.n_features = features.shape[1]
+        self._scores = (None, None)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, path, **kwargs):
+        """
+        :param path: Wide-layout CSV such as dataset.csv
+        :param kwargs: Passed on to utils.featurizer.featurize_csv
+        :return: CaseIndex
+        """
+        features, labels, _ = featurize_csv(path, **kwargs)
+        return cls(features, labels)
+
+    def exact(self, columns):
+        """
+        :param columns: Sorted feature column tuple of a request
+        :return: Index of the identical known case, or None
+        """
+        return self._exact.get(pack_columns(columns, self.n_words).tobytes())
+
+    def scores(self, model, version):
+        """
+        Model probabilities of every known case, computed in one batch the
+        first time they are needed for a model version.
+
+        :param model: Model exposing predict_proba
+        :param version: Version identifying the model
+        :return: (n_cases, n_classes) array of class probabilities
+        """
+        scored_version, proba = self._scores
+        if scored_version == version:
+            return proba
+        with self._lock:
+            if self._scores[0] != version:
+                self._scores = (version, model.predict_proba(indices_to_csr(self.columns, self.n_features)))
+            return self._scores[1]
+
+    def nearest(self, columns, k=5):
+        """
+        Ranks known cases by Jaccard similarity to the request.
+
+        :param columns: Sorted feature column tuple of a request
+        :param k: Number of cases returned (int)
+        :return: (indices, similarities), best first
+        """
+        query = pack_columns(columns, self.n_words)
+        shared = _popcount(self.signatures & query)
+        union = self.sizes + len(columns) - shared
+        similarity = np.where(union > 0, shared / np.maximum(union, 1), 1.0)
+
+        k = min(k, len(similarity))
+        top = np.argpartition(-similarity, k - 1)[:k]
+        # Ties broken by how often the case was recorded
+        order = np.lexsort((-self.counts[top], -similarity[top]))
+        return top[order], similarity[top[order]]
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    index = CaseIndex.from_csv('dataset.csv')
+    print(f"Indexed {len(index.signatures)} distinct cases ({int(index.counts.sum())} rows, "
+          f"{index.n_words} words each) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    query = index.columns[0][:-1]
+    for name, fn in (('exact', lambda: index.exact(index.columns[0])), ('nearest', lambda: index.nearest(query))):
+        start = time.perf_counter()
+        for _ in range(1000):
+            fn()
+        print(f"{name:>8}: {(time.perf_counter() - start) * 1000:.1f} us per lookup")
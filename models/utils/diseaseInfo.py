@@ -0,0 +1,42 @@
+import csv
+from types import MappingProxyType
+
+NO_DESCRIPTION = "No description available"
+
+
+def _disease_key(name):
+    # The CSVs disagree with the model labels on spacing, e.g. "Diabetes "
+    return " ".join(name.split()).lower()
+
+
+def load_disease_info(desc_path, prec_path, diseases):
+    """
+    Compiles the description and precaution CSVs into a read-only lookup so
+    that building a prediction response needs no DataFrame scans.
+
+    :param desc_path: Path to symptom_Description.csv
+    :param prec_path: Path to symptom_precaution.csv
+    :param diseases: Model class labels to key the table by (list)
+    :return: Read-only mapping of disease -> (description, precautions tuple)
+    """
+    descriptions = {}
+    with open(desc_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            if row:
+                descriptions[_disease_key(row[0])] = row[1].strip()
+
+    precautions = {}
+    with open(prec_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            if row:
+                precautions[_disease_key(row[0])] = tuple(p.strip() for p in row[1:] if p.strip())
+
+    info = {}
+    for disease in diseases:
+        key = _disease_key(disease)
+        info[disease] = (descriptions.get(key, NO_DESCRIPTION), precautions.get(key, ()))
+    return MappingProxyType(info)
@@ -0,0 +1,122 @@
+"""
+Streaming featurizer turning the wide Symptom_1..Symptom_N layout of
+dataset.csv into the sparse feature matrix the server scores.
+
+The CSV is read in chunks; within a chunk every cell is factorized, only the
+distinct tokens are normalized through the server's symptom index, and the
+(row, column) pairs are expanded with NumPy, so no Python code runs per row.
+Memory stays proportional to the number of symptoms recorded.
+
+Usage (from the models directory):
+    python -m utils.featurizer dataset.csv [--chunksize 100000] [--output features.npz]
+"""
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from utils.severity import apply_feature_weights, load_severity_weights
+from utils.symptomIndex import build_symptom_index, lookup_symptom
+from utils.vocabulary import symptoms
+
+
+def _token_columns(tokens, index):
+    """
+    Resolves distinct raw tokens to feature columns.
+
+    :return: (counts, columns) where token i owns columns[offsets[i]:offsets[i] + counts[i]]
+    """
+    resolved = [lookup_symptom(index, token) or () for token in tokens]
+    counts = np.fromiter((len(cols) for cols in resolved), dtype=np.int64, count=len(resolved))
+    columns = np.fromiter((c for cols in resolved for c in cols), dtype=np.int32, count=counts.sum())
+    return counts, columns
+
+
+def featurize_chunk(chunk, index, n_features, label_column='Disease'):
+    """
+    Featurizes one DataFrame chunk of the wide layout.
+
+    :param chunk: DataFrame with a label column and one column per symptom slot
+    :param index: Table returned by utils.symptomIndex.build_symptom_index
+    :param n_features: Number of model features (int)
+    :param label_column: Name of the label column (str)
+    :return: (features, labels, unknown) with an (N, n_features) CSR matrix of
+             ones, the stripped labels and a Counter of unrecognised tokens
+    """
+    labels = chunk[label_column].astype(str).str.strip().to_numpy()
+    cells = chunk.drop(columns=[label_column]).to_numpy(dtype=object)
+    n_rows, n_slots = cells.shape
+
+    codes, tokens = pd.factorize(cells.ravel(), use_na_sentinel=True)
+    rows = np.repeat(np.arange(n_rows, dtype=np.int64), n_slots)
+    present = codes >= 0
+    codes, rows = codes[present], rows[present]
+
+    counts, columns = _token_columns(tokens, index)
+    unknown = Counter({str(tokens[t]).strip(): int(n)
+                       for t, n in zip(*np.unique(codes[counts[codes] == 0], return_counts=True))})
+
+    # Expand every cell into the columns its token sets
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    per_cell = counts[codes]
+    cell_rows = np.repeat(rows, per_cell)
+    starts = np.repeat(offsets[codes] - np.cumsum(per_cell) + per_cell, per_cell)
+    cell_cols = columns[starts + np.arange(per_cell.sum())]
+
+    features = sparse.csr_matrix((np.ones(len(cell_rows), dtype=np.float32), (cell_rows, cell_cols)),
+                                 shape=(n_rows, n_features))
+    # A symptom repeated within a row, or both spellings of it, still sets a single 1
+    features.sum_duplicates()
+    features.data[:] = 1
+    return features, labels, unknown
+
+
+def featurize_csv(path, index=None, n_features=None, chunksize=100_000, label_column='Disease', weights=None):
+    """
+    Streams a wide-layout CSV into one sparse feature matrix.
+
+    :param path: CSV path (e.g. dataset.csv)
+    :param index: Symptom index, defaults to the server's
+    :param n_features: Number of model features, defaults to the server's
+    :param chunksize: Rows read per chunk (int)
+    :param label_column: Name of the label column (str)
+    :param weights: Per-column weights for the severity encoding, see utils.severity (optional)
+    :return: (features, labels, unknown) as returned by featurize_chunk, for the whole file
+    """
+    if index is None:
+        index, n_features = build_symptom_index(symptoms), len(symptoms)
+
+    parts, labels, unknown = [], [], Counter()
+    for chunk in pd.read_csv(path, dtype=str, chunksize=chunksize):
+        features, chunk_labels, chunk_unknown = featurize_chunk(chunk, index, n_features, label_column)
+        parts.append(apply_feature_weights(features, weights))
+        labels.append(chunk_labels)
+        unknown.update(chunk_unknown)
+
+    if not parts:
+        return sparse.csr_matrix((0, n_features), dtype=np.float32), np.array([], dtype=object), unknown
+    return sparse.vstack(parts, format='csr'), np.concatenate(labels), unknown
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Featurize a wide-layout symptom CSV")
+    parser.add_argument('path')
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--output', help='Save the CSR matrix with scipy.sparse.save_npz')
+    parser.add_argument('--severity', help='Weight features by this severity CSV (e.g. Symptom-severity.csv)')
+    args = parser.parse_args()
+
+    weights = load_severity_weights(args.severity, symptoms) if args.severity else None
+    start = time.perf_counter()
+    features, labels, unknown = featurize_csv(args.path, chunksize=args.chunksize, weights=weights)
+    elapsed = time.perf_counter() - start
+
+    print(f"Featurized {features.shape[0]} rows x {features.shape[1]} features "
+          f"({features.nnz} symptoms set, {len(set(labels))} labels) in {elapsed * 1000:.1f} ms")
+    for token, count in unknown.most_common():
+        print(f"Symptom not found: {token} ({count} rows)")
+    if args.output:
+        sparse.save_npz(args.output, features)
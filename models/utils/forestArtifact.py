@@ -0,0 +1,256 @@
+"""
+Flat, memory-mappable export format for the tree-ensemble symptom classifier.
+
+A fitted scikit-learn forest is flattened into a handful of contiguous NumPy
+arrays, one .npy file each, inside an artifact directory:
+
+    feature.npy       int32   (n_nodes,)    split feature of every internal node
+    threshold.npy     float32 (n_nodes,)    split threshold (go left if x <= t)
+    left.npy          int32   (n_nodes,)    left child, or ~leaf for a leaf
+    right.npy         int32   (n_nodes,)    right child, or ~leaf for a leaf
+    roots.npy         int32   (n_trees,)    root node of every tree
+    leaf_value.npy    float32 (n_leaves, n_classes) class distribution of every leaf
+    meta.json                               shapes, class labels, source model
+
+Node ids are global across trees. A child id < 0 encodes leaf ~id, so a walk
+stops as soon as the current id turns negative.
+
+Usage (from the models directory):
+    python -m utils.forestArtifact ExtraTrees ExtraTrees.forest
+"""
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from scipy import sparse
+
+FORMAT_VERSION = 1
+ARRAYS = ('feature', 'threshold', 'left', 'right', 'roots', 'leaf_value')
+
+
+def flatten_forest(model):
+    """
+    Flattens a fitted scikit-learn tree ensemble classifier into global node arrays.
+
+    :param model: Fitted forest classifier exposing estimators_ (e.g. ExtraTreesClassifier)
+    :return: (arrays, meta) with one array per name in ARRAYS and the artifact metadata
+    """
+    features, thresholds, lefts, rights, roots, leaf_values = [], [], [], [], [], []
+    node_offset = 0
+    leaf_offset = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        n_nodes = tree.node_count
+
+        # Number the leaves of this tree after those of the previous trees
+        leaf_ids = np.full(n_nodes, -1, dtype=np.int64)
+        leaf_ids[is_leaf] = leaf_offset + np.arange(is_leaf.sum())
+
+        def remap(children):
+            children = np.asarray(children, dtype=np.int64)
+            mapped = np.empty(n_nodes, dtype=np.int64)
+            mapped[~is_leaf] = children[~is_leaf] + node_offset
+            # Leaves point at themselves through their encoded leaf id
+            mapped[is_leaf] = ~leaf_ids[is_leaf]
+            return mapped
+
+        feature = np.where(is_leaf, 0, tree.feature)
+        threshold = np.where(is_leaf, 0.0, tree.threshold)
+        value = tree.value[is_leaf, 0, :]
+        value = value / value.sum(axis=1, keepdims=True)
+
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(remap(tree.children_left))
+        rights.append(remap(tree.children_right))
+        roots.append(node_offset if not is_leaf[0] else ~leaf_ids[0])
+        leaf_values.append(value)
+
+        node_offset += n_nodes
+        leaf_offset += int(is_leaf.sum())
+
+    arrays = {
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float32),
+        'left': np.concatenate(lefts).astype(np.int32),
+        'right': np.concatenate(rights).astype(np.int32),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'leaf_value': np.concatenate(leaf_values).astype(np.float32),
+    }
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'source': type(model).__name__,
+        'n_features': int(model.n_features_in_),
+        'n_classes': int(len(model.classes_)),
+        'n_trees': len(model.estimators_),
+        'n_nodes': int(node_offset),
+        'n_leaves': int(leaf_offset),
+        'classes': [c.item() if hasattr(c, 'item') else c for c in model.classes_],
+    }
+    return arrays, meta
+
+
+def export_forest(model, path):
+    """
+    Flattens a fitted scikit-learn tree ensemble classifier into an artifact directory.
+    The artifact is written to a sibling directory and renamed into place, so
+    processes that have an artifact already at path memory-mapped keep reading
+    the old files instead of seeing them rewritten underneath.
+
+    :param model: Fitted forest classifier exposing estimators_ (e.g. ExtraTreesClassifier)
+    :param path: Output directory (replaced if it exists)
+    :return: Dict of metadata written to meta.json
+    """
+    arrays, meta = flatten_forest(model)
+
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f'.{os.path.basename(path)}.', dir=parent)
+    try:
+        os.chmod(staging, 0o755)
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        _swap_in(staging, path)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return meta
+
+
+def _swap_in(staging, path):
+    # A non-empty directory cannot be replaced in one rename; the watcher in
+    # utils.modelRegistry retries while path is briefly missing
+    if not os.path.exists(path):
+        os.rename(staging, path)
+        return
+    retired = f'{staging}.old'
+    os.rename(path, retired)
+    try:
+        os.rename(staging, path)
+    except OSError:
+        os.rename(retired, path)
+        raise
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+class FlatForest:
+    """
+    Tree ensemble backed by the flat arrays of an exported artifact.
+
+    Exposes the subset of the scikit-learn classifier interface the server
+    uses (predict_proba, classes_, n_features_in_).
+    """
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.roots = arrays['roots']
+        self.leaf_value = arrays['leaf_value']
+        self.meta = meta
+        self.classes_ = np.asarray(meta['classes'])
+        self.n_features_in_ = meta['n_features']
+        self.n_classes = meta['n_classes']
+
+    def apply(self, X):
+        """
+        Finds the leaf reached by every row in every tree.
+
+        :param X: (N, n_features) feature matrix, dense or scipy.sparse
+        :return: (N, n_trees) array of leaf ids
+        """
+        if sparse.issparse(X):
+            X = X.toarray()
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])
+        leaves = np.empty((X.shape[0], len(self.roots)), dtype=np.int64)
+        for t, root in enumerate(self.roots):
+            node = np.full(X.shape[0], root, dtype=np.int64)
+            active = node >= 0
+            while active.any():
+                current = node[active]
+                go_left = X[rows[active], self.feature[current]] <= self.threshold[current]
+                node[active] = np.where(go_left, self.left[current], self.right[current])
+                active = node >= 0
+            leaves[:, t] = ~node
+        return leaves
+
+    def predict_proba(self, X):
+        """
+        Averages the leaf class distributions over all trees.
+
+        :param X: (N, n_features) feature matrix, dense or scipy.sparse
+        :return: (N, n_classes) array of class probabilities
+        """
+        leaves = self.apply(X)
+        return self.leaf_value[leaves].mean(axis=1, dtype=np.float64)
+
+
+def load_forest(path, mmap=True):
+    """
+    Loads an exported artifact. With mmap the arrays are mapped read-only, so
+    every process serving the same artifact shares one copy in the page cache.
+
+    :param path: Artifact directory written by export_forest
+    :param mmap: Memory-map the arrays instead of reading them (bool)
+    :return: FlatForest
+    """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported forest artifact version: {meta.get('format_version')}")
+
+    mode = 'r' if mmap else None
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode) for name in ARRAYS}
+    return FlatForest(arrays, meta)
+
+
+def model_version(path):
+    """
+    Identifies the artifact or pickle currently at path, changing whenever it is replaced.
+
+    :param path: Artifact directory or pickle file
+    :return: Version string made of the file name and its modification time
+    """
+    stamp = os.path.join(path, 'meta.json') if os.path.isdir(path) else path
+    return f"{os.path.basename(os.path.normpath(path))}@{os.stat(stamp).st_mtime_ns}"
+
+
+def load_model(path):
+    """
+    Loads either an exported forest artifact (directory) or a pickled estimator.
+
+    :param path: Artifact directory or pickle file
+    :return: Object exposing predict_proba
+    """
+    if os.path.isdir(path):
+        return load_forest(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python -m utils.forestArtifact <pickled model> <artifact dir>")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'rb') as f:
+        source = pickle.load(f)
+    meta = export_forest(source, sys.argv[2])
+    print(f"Exported {meta['n_trees']} trees ({meta['n_nodes']} nodes, {meta['n_leaves']} leaves) to {sys.argv[2]}")
+
+    start = time.perf_counter()
+    exported = load_forest(sys.argv[2])
+    print(f"Artifact loads in {(time.perf_counter() - start) * 1000:.2f} ms")
@@ -0,0 +1,234 @@
+"""
+Latency and throughput benchmark for the prediction service.
+
+Replays symptom sets sampled from dataset.csv (3 to 6 symptoms of one
+recorded case, shuffled, and redrawn when they equal a recorded case, which
+app.py answers from its case index without scoring) against app.py, either in-process through the Flask
+test client or over HTTP against a running server, and prints one JSON
+report so runs can be compared across commits.
+
+Modes:
+    single   one /predict call per symptom set, prediction cache disabled
+             (in-process only; a remote server keeps its cache); no set
+             matches a recorded case, so every call reaches the model
+    batch    /predict/batch calls of --batch-size sets each
+    cached   /predict on a small pool of repeated sets, after priming the cache
+
+Usage (from the models directory):
+    python -m utils.loadTest --requests 500 --output bench.json
+    python -m utils.loadTest --url http://localhost:5000 --concurrency 16
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+MODES = ('single', 'batch', 'cached')
+
+
+def sample_symptom_sets(path, n, seed=0, min_size=3, max_size=6):
+    """
+    Draws realistic symptom sets from the recorded cases of dataset.csv, none of
+    which equals a recorded case.
+
+    :param path: Path to dataset.csv
+    :param n: Number of sets to draw (int)
+    :param seed: Random seed, so runs replay the same requests (int)
+    :return: List of symptom name lists, spelled as in the CSV
+    """
+    with open(path, newline='') as f:
+        cases = [[s.strip() for s in row[1:] if s.strip()] for row in csv.reader(f)][1:]
+    known = {frozenset(case) for case in cases}
+    # A case of min_size symptoms or fewer can only be drawn whole
+    cases = [case for case in cases if len(case) > min_size]
+    rng = random.Random(seed)
+    sets = []
+    while len(sets) < n:
+        case = rng.choice(cases)
+        size = min(len(case), rng.randint(min_size, max_size))
+        drawn = rng.sample(case, size)
+        if frozenset(drawn) not in known:
+            sets.append(drawn)
+    return sets
+
+
+class InProcessClient:
+    """Posts to app.py through the Flask test client, without a network hop."""
+
+    def __init__(self):
+        # Keep the app's request logs out of the JSON report on stdout
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        import app
+        self.app = app
+        self.client = app.app.test_client()
+        self._cache_size = app.prediction_cache.max_size
+
+    def post(self, route, payload):
+        response = self.client.post(route, json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"{route} returned {response.status_code}")
+
+    def set_cache(self, enabled):
+        cache = self.app.prediction_cache
+        cache.clear()
+        cache.max_size = self._cache_size if enabled else 0
+
+    def memory(self):
+        return {str(os.getpid()): resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.app.prediction_cache.max_size = self._cache_size
+
+
+class HttpClient:
+    """Posts to a running server; the cache cannot be toggled remotely."""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def post(self, route, payload):
+        request = urllib.request.Request(self.url + route, data=json.dumps(payload).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def get(self, route):
+        with urllib.request.urlopen(self.url + route, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def set_cache(self, enabled):
+        pass
+
+    def memory(self, probes=32):
+        # Requests land on whichever worker accepts them, so sample a few times
+        workers = {}
+        for _ in range(probes):
+            worker = self.get('/admin/model')['worker']
+            workers[str(worker['pid'])] = worker['max_rss_mb']
+        return workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def run(client, route, payloads, rows_per_call, concurrency):
+    """
+    Sends every payload and times each call.
+
+    :return: Dict of call count, latency percentiles (ms) and throughput
+    """
+    def timed(payload):
+        start = time.perf_counter()
+        client.post(route, payload)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, payloads))
+    else:
+        latencies = [timed(payload) for payload in payloads]
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000.0
+    return {
+        'calls': len(payloads),
+        'rows_per_call': rows_per_call,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'calls_per_sec': len(payloads) / elapsed,
+        'rows_per_sec': len(payloads) * rows_per_call / elapsed,
+    }
+
+
+def benchmark(client, sets, modes, batch_size, concurrency, warmup=20):
+    results = {}
+    if 'single' in modes:
+        client.set_cache(False)
+        run(client, '/predict', sets[:warmup], 1, 1)
+        results['single'] = run(client, '/predict', sets, 1, concurrency)
+    if 'batch' in modes:
+        client.set_cache(False)
+        batches = [sets[i:i + batch_size] for i in range(0, len(sets) - batch_size + 1, batch_size)]
+        results['batch'] = run(client, '/predict/batch', batches, batch_size, concurrency)
+    if 'cached' in modes:
+        client.set_cache(True)
+        popular = sets[:16]
+        run(client, '/predict', popular, 1, 1)
+        results['cached'] = run(client, '/predict', [popular[i % len(popular)] for i in range(len(sets))],
+                                1, concurrency)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Benchmark a running server instead of app.py in-process')
+    parser.add_argument('--dataset', default='dataset.csv')
+    parser.add_argument('--requests', type=int, default=1000, help='Symptom sets per mode')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report here as well as to stdout')
+    args = parser.parse_args(argv)
+
+    modes = [m for m in args.modes.split(',') if m]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"Unknown modes: {', '.join(sorted(unknown))}")
+
+    sets = sample_symptom_sets(args.dataset, args.requests, seed=args.seed)
+    client = HttpClient(args.url) if args.url else InProcessClient()
+    with client:
+        results = benchmark(client, sets, modes, args.batch_size, args.concurrency)
+        memory = client.memory()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'target': args.url or 'in-process',
+        'config': {
+            'requests': args.requests,
+            'batch_size': args.batch_size,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'environment': {k: v for k, v in os.environ.items()
+                            if k.startswith(('INFERENCE_', 'MICRO_BATCH', 'MODEL_', 'PREDICTION_CACHE'))},
+        },
+        'results': results,
+        'max_rss_mb_per_worker': memory,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into one vectorized call.
+
+    Requests are queued and a background thread drains them in batches of up
+    to max_batch_size rows, waiting at most max_wait_ms after the first row of
+    a batch arrives before running predict_fn on the stacked rows. A row that
+    finds the queue otherwise empty is scored at once: batches form while a
+    previous batch is being scored, and a lone request pays no window.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0, history=4096, stack_fn=np.vstack):
+        """
+        :param predict_fn: Callable taking an (N, F) array and returning (N, C) probabilities
+        :param max_batch_size: Most rows coalesced into a single call (int)
+        :param max_wait_ms: Collection window after the first queued row (float)
+        :param history: Number of recent batches kept for percentile stats (int)
+        :param stack_fn: Combines the queued rows into predict_fn's input (callable)
+        """
+        self.predict_fn = predict_fn
+        self.stack_fn = stack_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+        self._batches = 0
+        self._rows = 0
+        self._size_counts = {}
+        self._recent_waits = deque(maxlen=history)
+        self._recent_sizes = deque(maxlen=history)
+
+    def submit(self, row):
+        """
+        Queues one feature row.
+
+        :param row: Feature row as accepted by stack_fn (1-D vector by default)
+        :return: Future resolving to the row's probability vector
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((row, future, time.perf_counter()))
+        return future
+
+    def predict(self, row, timeout=None):
+        """
+        Queues one feature row and blocks until its batch has been scored.
+
+        :param row: Feature row as accepted by stack_fn (1-D vector by default)
+        :param timeout: Seconds to wait for the result (float, optional)
+        :return: Probability vector for the row
+        """
+        return self.submit(row).result(timeout)
+
+    def stats(self):
+        """
+        Batch size and queueing latency figures for tuning the window.
+
+        :return: Dict of counters, a batch size histogram and wait percentiles (ms)
+        """
+        with self._lock:
+            waits = np.array(self._recent_waits) * 1000.0
+            sizes = np.array(self._recent_sizes)
+            stats = {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': self._batches,
+                'rows': self._rows,
+                'batch_size_histogram': dict(sorted(self._size_counts.items())),
+                'queue_depth': self._queue.qsize(),
+            }
+        if len(sizes):
+            stats['mean_batch_size'] = float(sizes.mean())
+            stats['queue_wait_ms'] = {
+                'p50': float(np.percentile(waits, 50)),
+                'p95': float(np.percentile(waits, 95)),
+                'p99': float(np.percentile(waits, 99)),
+                'max': float(waits.max()),
+            }
+        return stats
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so each (gunicorn) worker starts its own
+        if self._pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._worker.is_alive():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._pid = os.getpid()
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        if self._queue.empty():
+            return batch
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            rows, futures, queued_at = zip(*batch)
+            started = time.perf_counter()
+            try:
+                proba = self.predict_fn(self.stack_fn(rows))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future, result in zip(futures, proba):
+                    future.set_result(result)
+            self._record(len(batch), [started - t for t in queued_at])
+
+    def _record(self, size, waits):
+        with self._lock:
+            self._batches += 1
+            self._rows += size
+            self._size_counts[size] = self._size_counts.get(size, 0) + 1
+            self._recent_sizes.append(size)
+            self._recent_waits.extend(waits)
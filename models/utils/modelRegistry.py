@@ -0,0 +1,226 @@
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.forestArtifact import model_version
+
+logger = logging.getLogger(__name__)
+
+# Immutable snapshot of a loaded model; requests grab one and keep using it
+# even if a newer model is activated while they are in flight
+ModelHandle = namedtuple('ModelHandle', ['model', 'version', 'path', 'loaded_at', 'load_ms', 'warmup_ms'])
+
+
+class ModelRegistry:
+    """
+    Holds the active model and swaps in new versions without a restart.
+
+    A new artifact is loaded, warmed up and checked on a background thread;
+    only once it passes is the active handle replaced, which is a single
+    reference assignment, so requests never see a half-loaded model.
+
+    Requests hold a handle through acquire()/release() (or using()); a
+    retired model that holds resources, such as a process pool, is closed
+    once the last request holding it has released it.
+    """
+
+    def __init__(self, loader, warmup_rows, n_classes, watch_interval=0, path=None):
+        """
+        :param loader: Callable turning an artifact path into a model exposing predict_proba
+        :param warmup_rows: Feature rows scored before a model is activated
+        :param n_classes: Number of classes every model must predict (int)
+        :param watch_interval: Seconds between checks of the active path for a new version, 0 to disable (float)
+        :param path: Artifact loaded by the first current() call if load() has not run yet (optional)
+        """
+        self.loader = loader
+        self.path = path
+        self.warmup_rows = warmup_rows
+        self.n_classes = n_classes
+        self.watch_interval = watch_interval
+        self._active = None
+        self._lock = threading.Lock()
+        self._first_load = threading.Lock()
+        self._loading = None
+        self._last_error = None
+        self._failed_version = None
+        self._watcher = None
+        self._pid = None
+        # id(handle) -> requests holding it, and retired handles waiting for their last user
+        self._users = {}
+        self._retired = {}
+
+    def load(self, path):
+        """
+        Loads, checks and activates the model at path on the calling thread.
+
+        :param path: Artifact directory or pickle file
+        :return: The new active ModelHandle
+        """
+        version = model_version(path)
+        start = time.perf_counter()
+        model = self.loader(path)
+        loaded = time.perf_counter()
+        proba = np.asarray(model.predict_proba(self.warmup_rows))
+        warmed = time.perf_counter()
+        self._check(proba)
+
+        handle = ModelHandle(
+            model=model,
+            version=version,
+            path=path,
+            loaded_at=time.time(),
+            load_ms=(loaded - start) * 1000.0,
+            warmup_ms=(warmed - loaded) * 1000.0,
+        )
+        with self._lock:
+            retired, self._active = self._active, handle
+            if retired is not None and self._users.get(id(retired)):
+                self._retired[id(retired)] = retired
+                retired = None
+        if retired is not None:
+            self._close(retired)
+        return handle
+
+    def reload(self, path=None):
+        """
+        Starts loading a model in the background; the current one keeps serving meanwhile.
+
+        :param path: Artifact to load, defaults to the active one
+        :return: False if another load is already running, else True
+        """
+        with self._lock:
+            if self._loading is not None:
+                return False
+            path = path or (self._active.path if self._active else self.path)
+            self._loading = path
+        threading.Thread(target=self._load_in_background, args=(path,), name='model-reload', daemon=True).start()
+        return True
+
+    def current(self):
+        """
+        :return: The active ModelHandle
+        """
+        if self._active is None:
+            self._load_first()
+        if self.watch_interval:
+            self._ensure_watcher()
+        return self._active
+
+    def acquire(self):
+        """
+        Takes the active handle for a request; pair with release().
+
+        :return: The active ModelHandle
+        """
+        self.current()
+        with self._lock:
+            handle = self._active
+            self._users[id(handle)] = self._users.get(id(handle), 0) + 1
+        return handle
+
+    def release(self, handle):
+        """
+        :param handle: ModelHandle returned by acquire()
+        """
+        with self._lock:
+            remaining = self._users[id(handle)] - 1
+            if remaining:
+                self._users[id(handle)] = remaining
+                return
+            del self._users[id(handle)]
+            retired = self._retired.pop(id(handle), None)
+        if retired is not None:
+            # Off the request thread: closing a pool waits for its processes to exit
+            threading.Thread(target=self._close, args=(retired,), name='model-close', daemon=True).start()
+
+    @contextmanager
+    def using(self):
+        """
+        Holds the active handle for the duration of the block.
+        """
+        handle = self.acquire()
+        try:
+            yield handle
+        finally:
+            self.release(handle)
+
+    def status(self):
+        """
+        :return: Dict describing the active version and any pending or failed load
+        """
+        handle = self.current()
+        with self._lock:
+            return {
+                'version': handle.version,
+                'path': handle.path,
+                'model': type(handle.model).__name__,
+                'loaded_at': handle.loaded_at,
+                'load_ms': handle.load_ms,
+                'warmup_ms': handle.warmup_ms,
+                'loading': self._loading,
+                'last_error': self._last_error,
+            }
+
+    def _load_first(self):
+        # Models that start processes are loaded lazily by the process serving
+        # them, so concurrent first requests must not each load one
+        with self._first_load:
+            if self._active is None:
+                self.load(self.path)
+
+    def _close(self, handle):
+        # Models holding resources (e.g. a process pool) finish queued calls, then stop
+        close = getattr(handle.model, 'close', None)
+        if close:
+            try:
+                close()
+            except Exception:
+                logger.exception("Closing a retired model failed", extra={'version': handle.version})
+
+    def _check(self, proba):
+        if proba.shape != (self.warmup_rows.shape[0], self.n_classes):
+            raise ValueError(f"Model predicts shape {proba.shape}, expected "
+                             f"({self.warmup_rows.shape[0]}, {self.n_classes})")
+        if not np.isfinite(proba).all() or not np.allclose(proba.sum(axis=1), 1.0, atol=1e-4):
+            raise ValueError("Model returned invalid probabilities on the warm-up rows")
+
+    def _load_in_background(self, path):
+        version = error = None
+        try:
+            version = model_version(path)
+            self.load(path)
+        except Exception as e:
+            logger.exception("Model reload failed", extra={'path': path})
+            error = f"{path}: {str(e)}"
+        with self._lock:
+            self._loading = None
+            self._last_error = error
+            self._failed_version = version if error else None
+
+    def _ensure_watcher(self):
+        # Threads do not survive fork, so each (gunicorn) worker starts its own
+        if self._pid == os.getpid() and self._watcher.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+                self._pid = os.getpid()
+                self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
+            handle = self._active
+            try:
+                version = model_version(handle.path)
+            except OSError:
+                # Artifact is being replaced; look again on the next tick
+                continue
+            # A version that failed its checks is not retried until it changes again
+            if version not in (handle.version, self._failed_version):
+                self.reload(handle.path)
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of JSON-ready prediction responses with an optional TTL.
+
+    Entries belong to one model version. Looking up with a different version
+    drops every entry and writes made under another version are ignored, so
+    swapping the model artifact can never serve predictions made by the
+    previous one.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=0):
+        """
+        :param max_size: Most responses kept before the least recently used is evicted (int)
+        :param ttl_seconds: Seconds an entry stays valid, 0 for no expiry (float)
+        """
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key, version):
+        """
+        Looks up a cached response.
+
+        :param key: Hashable request key, e.g. (symptom column tuple, top_k)
+        :param version: Version of the model that would answer the request
+        :return: Cached response, or None on a miss
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            response, stored_at = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return response
+
+    def put(self, key, version, response):
+        """
+        Stores a response, evicting the least recently used entries when full.
+
+        :param key: Hashable request key
+        :param version: Version of the model that produced the response
+        :param response: JSON-ready response
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = (response, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        :return: Dict of size, limits and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'version': self.version,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self.version = version
@@ -0,0 +1,214 @@
+"""
+Multi-process inference pool for the symptom classifier.
+
+Every pool process memory-maps the same exported forest artifact instead of
+having the model pickled to it. With the default binary engine each process
+then compiles its own children, feature and lookup tables from the mapped
+arrays, so only leaf_value stays mapped and shared through the OS page cache;
+the sklearn engine walks the mapped arrays directly and shares all of them.
+Requests are shipped as the two small index arrays of a CSR matrix of ones
+(row pointers and symptom columns) and only the probability matrix comes
+back. Large batches are split across the processes.
+
+Usage (from the models directory), prints throughput for 1..N processes:
+    python -m utils.processPool ExtraTrees
+"""
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from utils.binaryForest import compile_forest
+from utils.forestArtifact import export_forest, load_forest
+from utils.severity import WeightedModel
+
+_worker_model = None
+
+
+def _init_worker(path, engine, feature_weights):
+    global _worker_model
+    _worker_model = load_forest(path)
+    if engine == 'binary':
+        _worker_model = compile_forest(_worker_model, feature_weights=feature_weights)
+    elif feature_weights is not None:
+        _worker_model = WeightedModel(_worker_model, feature_weights)
+
+
+def _worker_predict(indptr, indices, n_features):
+    X = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                          shape=(len(indptr) - 1, n_features))
+    return _worker_model.predict_proba(X)
+
+
+def _remove_artifact(path, owner_pid):
+    # Forked children inherit the finalizer but not the directory's ownership
+    if os.getpid() == owner_pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class InferencePool:
+    """
+    Scores feature matrices on a pool of processes sharing one mmapped artifact.
+
+    Exposes the subset of the scikit-learn classifier interface the server
+    uses (predict_proba, classes_, n_features_in_). Input must be 0/1 flags,
+    as produced by utils.symptomIndex.
+
+    The processes are started by the first predict_proba call and belong to
+    the process that made it: the forkserver they are forked from cannot be
+    used from a forked child. A pool shared through a gunicorn preload must
+    therefore not be called before the workers have forked.
+    """
+
+    def __init__(self, path, processes=None, engine='binary', min_chunk_rows=32, feature_weights=None):
+        """
+        :param path: Artifact directory written by utils.forestArtifact.export_forest
+        :param processes: Number of pool processes, defaults to the CPU count (int)
+        :param engine: 'binary' for the BinaryForest engine, anything else for FlatForest
+        :param min_chunk_rows: Smallest slice of a batch sent to one process (int)
+        :param feature_weights: Per-column weights the forest was trained with (optional)
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.path = path
+        self.processes = processes or os.cpu_count() or 1
+        self.engine = engine
+        self.min_chunk_rows = min_chunk_rows
+        self.feature_weights = feature_weights
+        self.classes_ = np.asarray(meta['classes'])
+        self.n_features_in_ = meta['n_features']
+        self._executor = None
+        self._pid = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._cleanup = None
+
+    @classmethod
+    def from_path(cls, path, processes=None, engine='binary', feature_weights=None):
+        """
+        Builds a pool from an artifact directory, exporting a pickled estimator
+        to a temporary artifact first. The temporary artifact is removed by
+        close(), or at exit if the pool is never closed.
+
+        :param path: Artifact directory or pickle file
+        :return: InferencePool
+        """
+        if os.path.isdir(path):
+            return cls(path, processes=processes, engine=engine, feature_weights=feature_weights)
+
+        with open(path, 'rb') as f:
+            source = pickle.load(f)
+        artifact = tempfile.mkdtemp(prefix='forest-')
+        try:
+            export_forest(source, artifact)
+            pool = cls(artifact, processes=processes, engine=engine, feature_weights=feature_weights)
+        except Exception:
+            shutil.rmtree(artifact, ignore_errors=True)
+            raise
+        pool._cleanup = weakref.finalize(pool, _remove_artifact, artifact, os.getpid())
+        return pool
+
+    def predict_proba(self, X):
+        """
+        :param X: (N, n_features) 0/1 feature matrix, dense or scipy.sparse
+        :return: (N, n_classes) array of class probabilities
+        """
+        X = sparse.csr_matrix(X)
+        X.eliminate_zeros()
+        if not (X.data == 1).all():
+            raise ValueError("InferencePool only accepts 0/1 feature matrices")
+        executor = self._ensure_executor()
+        n_chunks = max(1, min(self.processes, X.shape[0] // self.min_chunk_rows))
+        bounds = np.linspace(0, X.shape[0], n_chunks + 1).astype(int)
+        futures = []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            chunk = X[lo:hi]
+            futures.append(executor.submit(_worker_predict, chunk.indptr, chunk.indices, self.n_features_in_))
+        return np.vstack([future.result() for future in futures])
+
+    def close(self):
+        """
+        Stops the pool once the calls already submitted have finished and
+        removes the temporary artifact exported by from_path. A closed pool
+        cannot be used again.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._closed = True
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=True)
+        if self._cleanup is not None:
+            self._cleanup()
+
+    def _ensure_executor(self):
+        # The executor's management thread does not survive fork, so each
+        # (gunicorn) worker starts its own pool on first use
+        if self._pid == os.getpid() and self._executor is not None:
+            return self._executor
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("InferencePool is closed")
+            if self._pid != os.getpid() or self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('forkserver'),
+                    initializer=_init_worker,
+                    initargs=(self.path, self.engine, self.feature_weights),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+
+def benchmark(pool, X, clients, duration=3.0):
+    """
+    Runs concurrent clients, each sending one-row requests, against the pool.
+
+    :return: Rows scored per second
+    """
+    pool.predict_proba(X[:pool.processes * 2])
+    deadline = time.perf_counter() + duration
+
+    def client(seed):
+        rows, i = 0, seed
+        while time.perf_counter() < deadline:
+            pool.predict_proba(X[i % X.shape[0]:i % X.shape[0] + 1])
+            rows, i = rows + 1, i + clients
+        return rows
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as threads:
+        rows = sum(threads.map(client, range(clients)))
+    return rows / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Usage: python -m utils.processPool <pickled model or artifact dir>")
+        sys.exit(1)
+
+    rng = np.random.default_rng(0)
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    source = InferencePool.from_path(sys.argv[1])
+    path = source.path
+    print(f"{'processes':>9} {'rows/s':>10} {'speedup':>8}")
+    baseline = None
+    for processes in counts:
+        pool = InferencePool(path, processes=processes)
+        X = sparse.csr_matrix((rng.random((2000, pool.n_features_in_)) < 0.03).astype(np.float32))
+        rate = benchmark(pool, X, clients=4 * processes)
+        pool.close()
+        baseline = baseline or rate
+        print(f"{processes:>9} {rate:>10.0f} {rate / baseline:>7.2f}x")
+    source.close()
@@ -0,0 +1,25 @@
+import numpy as np
+
+
+def top_k(proba, k):
+    """
+    Selects the k most probable classes with a partial sort.
+
+    Works row-wise on a 2-D probability matrix; only the k selected entries of
+    each row are sorted, so cost stays linear in the number of classes.
+
+    :param proba: (C,) or (N, C) array of class probabilities
+    :param k: Number of classes to keep (int)
+    :return: (indices, probabilities), each shaped (k,) or (N, k), highest first
+    """
+    proba = np.asarray(proba)
+    k = max(1, min(k, proba.shape[-1]))
+
+    if k < proba.shape[-1]:
+        idx = np.argpartition(proba, -k, axis=-1)[..., -k:]
+    else:
+        idx = np.broadcast_to(np.arange(k), proba.shape).copy()
+
+    top = np.take_along_axis(proba, idx, axis=-1)
+    order = np.argsort(-top, axis=-1, kind='stable')
+    return np.take_along_axis(idx, order, axis=-1), np.take_along_axis(top, order, axis=-1)
@@ -0,0 +1,109 @@
+"""
+Severity-weighted feature encoding.
+
+Instead of 1, a present symptom is encoded as its weight from
+Symptom-severity.csv. The weights are precomputed once as a vector aligned to
+the model's feature columns and applied to whole matrices at a time.
+
+Usage (from the models directory), prints the encoding overhead:
+    python -m utils.severity [pickled model]
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from utils.symptomIndex import normalize_symptom
+
+
+def load_severity_weights(path, feature_names, default=1.0):
+    """
+    Builds the per-column weight vector of the severity encoding.
+
+    :param path: CSV with Symptom and weight columns (Symptom-severity.csv)
+    :param feature_names: Feature names in model column order (list)
+    :param default: Weight of columns without a severity entry (float)
+    :return: (n_features,) float32 array
+    """
+    table = pd.read_csv(path)
+    table['key'] = table['Symptom'].map(normalize_symptom)
+    # The CSV lists a few symptoms twice; the first entry wins
+    weights = table.drop_duplicates('key').set_index('key')['weight']
+    return np.array([weights.get(normalize_symptom(name), default) for name in feature_names], dtype=np.float32)
+
+
+def apply_feature_weights(X, weights):
+    """
+    Scales every column of a feature matrix by its weight.
+
+    :param X: (N, n_features) feature matrix, dense or scipy.sparse
+    :param weights: (n_features,) weight vector, or None to return X unchanged
+    :return: Weighted matrix of the same kind (CSR for sparse input)
+    """
+    if weights is None:
+        return X
+    if sparse.issparse(X):
+        X = X.tocsr().astype(np.float32, copy=True)
+        X.data *= weights[X.indices]
+        return X
+    return np.asarray(X, dtype=np.float32) * weights
+
+
+class WeightedModel:
+    """
+    Wraps a model trained on severity-weighted features so that it can be fed
+    the 0/1 features the server builds.
+    """
+
+    def __init__(self, model, weights):
+        self.model = model
+        self.weights = weights
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(apply_feature_weights(X, self.weights))
+
+    def close(self):
+        close = getattr(self.model, 'close', None)
+        if close:
+            close()
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+if __name__ == '__main__':
+    import pickle
+    import sys
+
+    from utils.binaryForest import compile_forest
+    from utils.loadTest import sample_symptom_sets
+    from utils.symptomIndex import build_feature_csr, build_symptom_index
+    from utils.vocabulary import symptoms
+
+    weights = load_severity_weights('Symptom-severity.csv', symptoms)
+    index = build_symptom_index(symptoms)
+    print(f"{int((weights != 1).sum())} of {len(weights)} columns carry a severity weight other than 1")
+
+    # Serving cost: the binary engine folds the weights into its splits at compile time.
+    # Timing only, the shipped model itself was trained on 0/1 features
+    with open(sys.argv[1] if len(sys.argv) > 1 else 'ExtraTrees', 'rb') as f:
+        source = pickle.load(f)
+    plain = compile_forest(source)
+    weighted = compile_forest(source, feature_weights=weights)
+
+    print(f"{'batch':>6} {'weighting us':>13} {'engine us':>10} {'weighted engine us':>19}")
+    for size in (1, 32, 1024):
+        X = build_feature_csr(index, len(symptoms), sample_symptom_sets('dataset.csv', size))[0]
+        repeat = 200 if size < 1024 else 20
+        print(f"{size:>6} {_best_of(lambda: apply_feature_weights(X, weights), repeat):>13.1f} "
+              f"{_best_of(lambda: plain.predict_proba(X), repeat):>10.1f} "
+              f"{_best_of(lambda: weighted.predict_proba(X), repeat):>19.1f}")
@@ -0,0 +1,67 @@
+import hashlib
+from bisect import bisect_left
+
+from utils.symptomIndex import normalize_symptom
+
+
+class SuggestIndex:
+    """
+    Sorted-array prefix index for symptom autocomplete.
+
+    Every symptom (and synonym) is entered once under its full normalized name
+    and once under each later word, so "rash" finds "skin rash". A query is a
+    binary search for the first entry with the prefix followed by a scan of the
+    matching run; nothing is recomputed per keystroke.
+    """
+
+    def __init__(self, names, synonyms=None, popularity=None):
+        """
+        :param names: Symptom names (list)
+        :param synonyms: Optional mapping of alias -> symptom name (dict)
+        :param popularity: Optional mapping of canonical symptom -> weight used for ranking (dict)
+        """
+        popularity = popularity or {}
+        aliases = {normalize_symptom(name): normalize_symptom(name) for name in names}
+        for alias, target in (synonyms or {}).items():
+            target = normalize_symptom(target)
+            if target in aliases:
+                aliases.setdefault(normalize_symptom(alias), target)
+
+        entries = []
+        for alias, symptom in aliases.items():
+            words = alias.split(' ')
+            for position in range(len(words)):
+                # Matches on the start of the whole name rank above later words
+                entries.append((' '.join(words[position:]), position > 0, alias, symptom))
+        entries.sort()
+
+        self.keys = [key for key, _, _, _ in entries]
+        self.entries = [(later_word, -popularity.get(symptom, 0), alias, symptom)
+                        for _, later_word, alias, symptom in entries]
+        self.version = hashlib.sha1('\n'.join(f"{k}\t{e}" for k, e in zip(self.keys, self.entries))
+                                    .encode()).hexdigest()[:16]
+
+    def suggest(self, query, limit=10):
+        """
+        :param query: Text typed so far
+        :param limit: Most suggestions returned (int)
+        :return: List of dicts with the canonical symptom and the name that matched, best first
+        """
+        prefix = normalize_symptom(query)
+        if not prefix or limit < 1:
+            return []
+
+        matches = []
+        for i in range(bisect_left(self.keys, prefix), len(self.keys)):
+            if not self.keys[i].startswith(prefix):
+                break
+            matches.append(self.entries[i])
+
+        seen, results = set(), []
+        for _, _, alias, symptom in sorted(matches):
+            if symptom not in seen:
+                seen.add(symptom)
+                results.append({'symptom': symptom, 'match': alias})
+                if len(results) == limit:
+                    break
+        return results
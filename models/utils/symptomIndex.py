@@ -0,0 +1,105 @@
+import re
+
+import numpy as np
+from scipy import sparse
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_symptom(name):
+    """
+    Canonicalizes a symptom name so that case, surrounding/duplicate
+    whitespace and underscore/space variants all map to the same key.
+
+    :param name: Raw symptom name as sent by a client or found in a CSV
+    :return: Canonical key (string), or None if the value is not a string
+    """
+    if not isinstance(name, str):
+        return None
+    return _WHITESPACE.sub(" ", name.replace("_", " ")).strip().lower()
+
+
+def build_symptom_index(symptoms, synonyms=None):
+    """
+    Builds the symptom lookup table used by the feature builder.
+
+    Every canonical symptom key maps to the tuple of feature columns that carry
+    it, so the underscore and space spellings present in the model's feature
+    list both light up for a single submitted symptom.
+
+    :param symptoms: Feature names in model column order (list)
+    :param synonyms: Optional mapping of alias -> symptom name (dict)
+    :return: Dict of canonical key -> tuple of column indices
+    """
+    columns = {}
+    for i, symptom in enumerate(symptoms):
+        columns.setdefault(normalize_symptom(symptom), []).append(i)
+
+    index = {key: tuple(cols) for key, cols in columns.items()}
+    for alias, target in (synonyms or {}).items():
+        cols = index.get(normalize_symptom(target))
+        if cols is not None:
+            index.setdefault(normalize_symptom(alias), cols)
+    return index
+
+
+def lookup_symptom(index, name):
+    """
+    Resolves a submitted symptom to its feature columns.
+
+    :param index: Table returned by build_symptom_index
+    :param name: Raw symptom name
+    :return: Tuple of column indices, or None if the symptom is unknown
+    """
+    return index.get(normalize_symptom(name))
+
+
+def build_feature_indices(index, submitted):
+    """
+    Resolves one list of symptoms to the sorted set of feature columns it sets.
+
+    :param index: Table returned by build_symptom_index
+    :param submitted: Symptom names submitted by the client (list)
+    :return: (columns, unknown) where columns is a sorted tuple of column indices
+             and unknown lists the symptoms that were not recognised
+    """
+    columns = set()
+    unknown = []
+    for symptom in submitted:
+        cols = lookup_symptom(index, symptom)
+        if cols is None:
+            unknown.append(symptom)
+        else:
+            columns.update(cols)
+    return tuple(sorted(columns)), unknown
+
+
+def indices_to_csr(rows, n_features):
+    """
+    Stacks per-row column index sets into a CSR matrix of ones.
+
+    :param rows: Sorted column index tuples, one per row (list)
+    :param n_features: Number of model features (int)
+    :return: (N, n_features) scipy.sparse.csr_matrix of float32
+    """
+    indptr = np.zeros(len(rows) + 1, dtype=np.int32)
+    np.cumsum([len(cols) for cols in rows], out=indptr[1:])
+    indices = np.fromiter((c for cols in rows for c in cols), dtype=np.int32, count=indptr[-1])
+    data = np.ones(len(indices), dtype=np.float32)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), n_features))
+
+
+def build_feature_csr(index, n_features, rows):
+    """
+    Builds a sparse N x n_features matrix for a batch of symptom lists, with
+    memory proportional to the number of symptoms submitted.
+
+    :param index: Table returned by build_symptom_index
+    :param n_features: Number of model features (int)
+    :param rows: One list of symptom names per patient (list of lists)
+    :return: (features, unknown) where features is an (N, n_features) CSR matrix
+             and unknown holds the unrecognised symptoms of each row
+    """
+    resolved = [build_feature_indices(index, submitted) for submitted in rows]
+    columns = [cols for cols, _ in resolved]
+    return indices_to_csr(columns, n_features), [missing for _, missing in resolved]